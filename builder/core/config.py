@@ -114,11 +114,14 @@ class BuildConfig:
             # General settings for the ZForgeBuilder itself
             'builder_config': {
                 'debian_release': 'sid',  # Base Debian version for the ISO
+                'debian_mirror': 'http://deb.debian.org/debian', # Mirror for debootstrap and the chroot's APT sources
                 'kernel_version': 'latest',    # Kernel version to install (can be specific or 'latest')
                 'output_iso_name': 'zforge-proxmox-v3.iso', # Name of the final ISO file
                 'enable_debug': True,          # Flag for enabling debug features in modules
                 'workspace_path': '/tmp/zforge_workspace', # Directory for all build operations
-                'cache_packages': True         # Whether to cache downloaded Debian packages
+                'upgrade_packages': True,      # Whether to upgrade the base system after debootstrap
+                'cache_chroot': True,          # Whether to keep the configured base chroot for identical later builds
+                'cache_packages': True         # Whether to cache downloaded Debian packages (through a local apt-cacher-ng, started if installed)
             },
             # Configuration for Proxmox VE integration
             'proxmox_config': {
@@ -4,24 +4,505 @@
 
 import libcalamares
 from libcalamares.utils import gettext_path, gettext_languages
-import subprocess
+import gettext
+import html
 import os
-import json # Added for lsblk parsing
+import re
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Dict, List, Optional
 
 from builder.utils.zfs_command_builder import build_zpool_create_command
 
+# pyudev lets the dialog notice disk hotplug; without it the lsblk cache just expires
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+# libcalamares.utils has no "is debug on" query, so the expensive debug dumps below
+# (whole dicts/lists formatted into one line) only run when CALAMARES_DEBUG=1
+_DEBUG = os.environ.get("CALAMARES_DEBUG") == "1"
+
 # **UI imports for custom widget**
-import gi
-gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, GLib
+# Loaded on first dialog construction: Calamares imports this module just to call
+# pretty_name(), and pulling in the GTK3 typelibs there is wasted work.
+Gtk = None
+GLib = None
+Gio = None
+Pango = None
+
+def _load_gtk():
+    """Import PyGObject/GTK into the module globals on first use"""
+    global Gtk, GLib, Gio, Pango
+    if Gtk is None:
+        import gi
+        gi.require_version('Gtk', '3.0')
+        from gi.repository import Gtk, GLib, Gio, Pango
+
+# Both list stores have four columns; used for insert_with_valuesv bulk loads
+_STORE_COLUMNS = [0, 1, 2, 3]
+
+# lsblk -P prints one device per line as KEY="value" pairs
+_LSBLK_RE = re.compile(r'(\w+)="([^"]*)"')
+
+# ZFS pool name: starts with a letter; letters, digits, _ - . after that; no trailing hyphen
+_POOL_NAME_RE = re.compile(r'[A-Za-z][A-Za-z0-9_.\-]*(?<!-)')
+# Root dataset given as parent/child (e.g. ROOT/proxmox)
+_DATASET_RE = re.compile(r'[^/]+/.+')
+
+
+class _LsblkCache:
+    """Last parsed lsblk scan, reused for TTL seconds or until invalidate() (udev block event)"""
+
+    TTL = 5.0
+
+    def __init__(self):
+        self.timestamp = 0.0
+        self.devices = None
+
+    def get(self):
+        if self.devices is not None and time.monotonic() - self.timestamp < self.TTL:
+            return self.devices
+        return None
+
+    def put(self, devices):
+        self.timestamp = time.monotonic()
+        self.devices = devices
+
+    def invalidate(self):
+        self.devices = None
+
+
+_LSBLK_CACHE = _LsblkCache()
+
+# Order in which the memoized summary sections are rendered; each gets its own label
+_SUMMARY_SECTIONS = ("workload", "mode", "properties")
+
+_RAID_TYPES = ("stripe", "mirror", "raidz1", "raidz2", "raidz3")
+
+# Profile order is fixed, so handlers can compare combo indices instead of text
+_WORKLOAD_PROFILES = ("General Desktop", "Virtual Machine Host", "Bulk File Storage/NAS", "Custom")
+
+# Choices offered by the advanced-settings combos
+_ASHIFT_OPTIONS = ("Auto-detect", "9", "12", "13")
+_COMPRESSION_OPTIONS = ("lz4", "zstd", "gzip", "off")
+_RECORDSIZE_OPTIONS = ("Default (128K)", "16K", "64K", "256K", "512K", "1M")
+_ATIME_OPTIONS = ("relatime", "off", "on")
+_XATTR_OPTIONS = ("sa", "posix")
+_DNODESIZE_OPTIONS = ("auto", "legacy")
+_ENCRYPTION_ALGORITHMS = ("aes-256-gcm", "aes-256-ccm", "chacha20-poly1305")
+# Option list behind each advanced-settings combo, by self._state key
+_COMBO_OPTIONS = MappingProxyType({
+    "ashift": _ASHIFT_OPTIONS, "compression": _COMPRESSION_OPTIONS, "recordsize": _RECORDSIZE_OPTIONS,
+    "atime": _ATIME_OPTIONS, "xattr": _XATTR_OPTIONS, "dnodesize": _DNODESIZE_OPTIONS,
+})
+# Reverse maps, option -> combo index, so presets don't .index() the tuples
+_COMBO_INDEX = MappingProxyType({
+    key: MappingProxyType({option: i for i, option in enumerate(options)})
+    for key, options in _COMBO_OPTIONS.items()
+})
+
+# Advanced settings in the order the summary's properties key uses them
+_ADVANCED_KEYS = ("ashift", "compression", "zstd_level", "recordsize", "atime",
+                  "xattr", "dnodesize", "arc_max_gb", "l2arc_devices")
+
+# Values each non-custom workload profile applies to the advanced settings.
+# arc_max_gb 0 means auto (ZFS default, typically 50% of RAM).
+_PROFILE_PRESETS = MappingProxyType({
+    "General Desktop": MappingProxyType(dict(
+        ashift="Auto-detect", compression="lz4", zstd_level=3, recordsize="Default (128K)",
+        atime="relatime", xattr="sa", dnodesize="auto", arc_max_gb=0, l2arc_devices="")),
+    "Virtual Machine Host": MappingProxyType(dict(
+        ashift="Auto-detect", compression="lz4", zstd_level=3, recordsize="64K",
+        atime="off", xattr="sa", dnodesize="auto", arc_max_gb=0, l2arc_devices="")),
+    "Bulk File Storage/NAS": MappingProxyType(dict(
+        ashift="Auto-detect", compression="zstd", zstd_level=6, recordsize="1M",
+        atime="off", xattr="sa", dnodesize="auto", arc_max_gb=0, l2arc_devices="")),
+})
+
+# Help text for the advanced setting labels, shown by ZFSTargetSelector._on_advanced_tooltip
+_ADVANCED_TOOLTIPS = MappingProxyType({
+    "ashift": (
+        "ashift determines the block size alignment for the pool (2^ashift). "
+        "'Auto-detect' is strongly recommended. Setting this incorrectly can severely "
+        "degrade performance and is permanent. Common values for modern drives are "
+        "12 (4K sectors) or 13 (8K sectors). Consult OpenZFS documentation for your specific hardware."
+    ),
+    "compression": (
+        "Selects the compression algorithm for the ZFS datasets. `lz4` is fast and generally recommended. "
+        "`zstd` offers better compression at higher CPU cost (see Zstd Level). `gzip` is older and slower. "
+        "`off` disables compression. See OpenZFS docs for benchmarks."
+    ),
+    "zstd_level": (
+        "Zstd compression level (1-19). Higher levels use more CPU for potentially better compression ratio. "
+        "Levels 1-3 are fast, 4-9 good balance. Levels 10+ have significant CPU cost. Test your workload!"
+    ),
+    "recordsize": (
+        "`recordsize` (or block size) for files. Default 128K is good for general use. "
+        "Databases might prefer smaller (e.g., 16K-64K for random I/O). "
+        "Large sequential files (video, backups) might benefit from larger (e.g., 1M). "
+        "Mismatched recordsize to workload can impact performance."
+    ),
+    "atime": (
+        "Controls how access times are updated. `relatime` (default) updates if previous atime is older than mtime/ctime. "
+        "`off` provides a performance boost by not updating atime, good for servers/VMs. `on` updates atime on every access."
+    ),
+    "xattr": (
+        "`sa` (System Attribute based) stores small xattrs directly in the inode, efficient for ACLs/SELinux. "
+        "`posix` stores them in hidden subdirectories, more compatible but can be slower."
+    ),
+    "dnodesize": (
+        "Size of dnodes. `auto` is usually best. `legacy` uses an older, smaller dnode size. "
+        "Relevant for xattr=sa, as larger dnodes can store more SA xattrs."
+    ),
+    "arc_max_gb": (
+        "Maximum size of the Adaptive Replacement Cache (ARC) in Gigabytes. ARC is ZFS's primary disk cache in RAM. "
+        "0 GB means 'auto' (typically 50% of system RAM). Manual tuning is for specific needs. "
+        "Too small can hurt performance; too large can starve applications of RAM."
+    ),
+    "l2arc_devices": (
+        "Secondary ARC (L2ARC) devices. Enter space-separated paths to fast SSD partitions (e.g., /dev/sdb1 /dev/sdc1). "
+        "L2ARC caches MAINLY metadata and RANDOM SMALL blocks by default (not large sequential reads). "
+        "It can improve performance for specific workloads but adds complexity and uses some RAM. "
+        "Ensure devices are dedicated and persistent."
+    ),
+})
+
+# Minimum disks needed to create a new pool of each RAID type
+_MIN_DISKS_PER_RAID = MappingProxyType(dict(
+    stripe=1,
+    mirror=2,
+    raidz1=3, # Common recommendation: N+1, N>=2 (so 2 data + 1 parity)
+    raidz2=4, # Common recommendation: N+2, N>=2 (so 2 data + 2 parity is min, better 3+ data) -> using slightly higher practical minimums
+    raidz3=5, # Common recommendation: N+3, N>=2 (so 2 data + 3 parity is min, better 3+ data)
+))
+
+# Absolute minimums the summary warns below (the validator above is stricter)
+_MIN_DISKS_SUMMARY = MappingProxyType(dict(mirror=2, raidz1=2, raidz2=3, raidz3=4))
+
+# Fixed status markup shown by the validators
+_MSG_EMPTY_PW = "<span foreground='red'>Encryption password cannot be empty</span>"
+_MSG_MISMATCH = "<span foreground='red'>Passwords do not match</span>"
+_MSG_WEAK = "<span foreground='orange'>Warning: Password is less than 8 characters</span>"
+_MSG_OK = "<span foreground='green'>✓ Passwords match</span>"
+_MSG_VALID = "<span foreground='green'>✓ Valid selection</span>"
+
+@lru_cache(maxsize=None)
+def _translation():
+    """Load the Calamares message catalog once"""
+    return gettext.translation("calamares-python",
+                               localedir=gettext_path(),
+                               languages=gettext_languages(),
+                               fallback=True)
+
+@lru_cache(maxsize=None)
+def _tr(msgid):
+    """Translate a UI string; repeated msgids resolve once"""
+    return _translation().gettext(msgid)
+
+@lru_cache(maxsize=None)
+def _option_model(options):
+    """One-column ListStore for a static option tuple, built once and shared by every combo"""
+    model = Gtk.ListStore(str)
+    for option in options:
+        model.append([option])
+    return model
+
+def _option_combo(options, active):
+    """ComboBox over the shared model for options; read it back with options[combo.get_active()]"""
+    combo = Gtk.ComboBox.new_with_model(_option_model(options))
+    cell = Gtk.CellRendererText()
+    combo.pack_start(cell, True)
+    combo.add_attribute(cell, "text", 0)
+    combo.set_active(active)
+    return combo
+
+def _block_devices_key():
+    """Whole-disk names under /sys/block; a published disk list is stale once this differs"""
+    try:
+        return sorted(os.listdir("/sys/block"))
+    except OSError:
+        return None
+
+def _display_size(size_bytes):
+    """lsblk --bytes gives exact sizes; format them for display"""
+    return GLib.format_size(int(size_bytes)) if size_bytes.isdigit() else "N/A"
+
+def _split_l2arc_devices(text):
+    """
+    L2ARC entry -> device list, split shell-style so quoted paths survive, or None
+    if the quoting is unbalanced. Validation and _finalize_selection both use this,
+    so the list that is checked is the list that is used.
+    """
+    try:
+        return shlex.split(text)
+    except ValueError:
+        return None
+
+def _l2arc_devices_valid(text):
+    """True if the L2ARC entry splits cleanly and every device is under /dev/"""
+    devices = _split_l2arc_devices(text)
+    return devices is not None and all(device.startswith("/dev/") for device in devices)
+
+@lru_cache(maxsize=8)
+def _zpool_create_command(args):
+    """build_zpool_create_command memoized on its keyword arguments.
+
+    `args` is a tuple of (name, value) pairs with lists and dicts passed as
+    tuples, so the whole form state is the cache key. Returns a tuple.
+    """
+    kwargs = dict(args)
+    for key in ("properties", "root_fs_options"):
+        kwargs[key] = dict(kwargs[key])
+    for key in ("disks", "log_devices", "cache_devices"):
+        kwargs[key] = list(kwargs[key])
+    return tuple(build_zpool_create_command(**kwargs))
+
+def _zpool_dry_run(command):
+    """Run `command` (a zpool create argv) with -n; return zpool's error text, or None.
+
+    None also covers a dry run that could not run at all (no zpool binary or timeout).
+    """
+    try:
+        result = subprocess.run(["zpool", "create", "-n"] + command[2:],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        libcalamares.utils.warning(f"zpool dry run skipped: {e}")
+        return None
+    if result.returncode != 0:
+        return result.stderr.strip() or f"zpool exited with status {result.returncode}"
+    return None
+
+def _finalize_selection(form):
+    """Turn a _snapshot_form() dict into (selected, global storage updates, error markup).
+
+    Pure Python plus the zpool dry run, so it can run off the GTK thread; nothing here
+    touches widgets or global storage. On failure selected and updates are None and
+    the markup says why.
+    """
+    # Global storage writes, applied together by _apply_and_close
+    updates = {}
+
+    # Determine operation mode (new_pool or existing_pool)
+    if form["creating_new_pool"]:
+        updates["zfs_operation_mode"] = "new_pool"
+
+        # --- Collect data for new pool creation ---
+        collected_pool_name = form["new_pool_name"]
+        collected_raid_type = form["raid_type"]
+
+        selected_disks = form["disks"]  # In the order the user ticked them
+        advanced = form["advanced"]
+
+        ashift_text = advanced["ashift"]
+        collected_ashift = int(ashift_text) if ashift_text != "Auto-detect" else None
+
+        # Pool properties (currently only ashift is explicitly set at pool level by build_zpool_create_command)
+        pool_props = {} # Empty for now, can be extended
+
+        # Root filesystem options
+        root_fs_opts = {}
+        comp_algo = advanced["compression"]
+        if comp_algo == "zstd":
+            zstd_level = advanced["zstd_level"]
+            root_fs_opts["compression"] = f"zstd-{zstd_level}"
+        else:
+            root_fs_opts["compression"] = comp_algo
+
+        record_size_text = advanced["recordsize"]
+        if record_size_text == "Default (128K)":
+            root_fs_opts["recordsize"] = "128K"
+        else:
+            root_fs_opts["recordsize"] = record_size_text
+
+        root_fs_opts["atime"] = advanced["atime"]
+        root_fs_opts["xattr"] = advanced["xattr"]
+        root_fs_opts["dnodesize"] = advanced["dnodesize"]
+
+        encryption_enabled = form["encryption_enabled"]
+        if encryption_enabled:
+            root_fs_opts["encryption"] = "on" # Standard ZFS property
+            # build_zpool_create_command doesn't handle keyformat/keylocation directly for root_fs_opts.
+            # These are usually handled by `zfs create -o keyformat=passphrase ...` after pool.
+            # For `zpool create`, encryption is simpler: just `-O encryption=on`.
+            # The password needs to be handled by Calamares during the `zpool create` or subsequent `zfs load-key`.
+            # We will store these separately for Calamares to use.
+            updates["zfs_encryption_keyformat"] = "passphrase"
+            updates["zfs_encryption_keylocation"] = "prompt"
+
+
+        # L2ARC devices
+        l2arc_devices = _split_l2arc_devices(advanced["l2arc_devices"].strip())
+        if l2arc_devices is None:
+            return None, None, "<span foreground='red'>Error: L2ARC device list has an unbalanced quote.</span>"
+        # A device listed twice would make zpool create fail, so keep only its first occurrence
+        collected_l2arc_devices = list(dict.fromkeys(l2arc_devices))
+
+        # SLOG devices (not in UI yet)
+        collected_slog_devices = []
+
+        # altroot - Calamares usually provides this as a job parameter (e.g. globalStorage['rootMountPoint'])
+        # For command generation testing, a placeholder.
+        # In a real scenario, this should be the actual target chroot path.
+        altroot_path = form["altroot"]
+
+
+        # Mountpoint for the pool's root dataset.
+        # For a root pool, this is typically '/', meaning it will be mounted at altroot_path.
+        # If the dataset entry is "ROOT/pve", the actual root dataset of the pool is just the pool itself.
+        # Child datasets are created later.
+        # The mountpoint for the pool itself. If datasets within it have their own mountpoints,
+        # this can be 'none' or 'legacy'. For a root filesystem, it's often '/'.
+        # Nothing later sets a mountpoint on the root dataset, so the pool keeps '/'
+        # and children inherit mountpoints under it (relative to the altroot).
+        pool_mountpoint = "/"
+
+        try:
+            # Unchanged form -> cached command (see _zpool_create_command)
+            zpool_command_args = list(_zpool_create_command((
+                ("pool_name", collected_pool_name),
+                ("raid_type", collected_raid_type),
+                ("disks", tuple(selected_disks)),
+                ("ashift", collected_ashift),
+                ("properties", tuple(pool_props.items())), # Pool level -o
+                ("root_fs_options", tuple(root_fs_opts.items())), # Root dataset -O
+                ("mountpoint", pool_mountpoint),
+                ("altroot", altroot_path),
+                ("log_devices", tuple(collected_slog_devices)), # SLOG
+                ("cache_devices", tuple(collected_l2arc_devices)), # L2ARC
+            )))
+            updates["zfs_new_pool_command"] = zpool_command_args
+            libcalamares.utils.debug(f"Generated zpool create command: {' '.join(zpool_command_args)}")
+
+        except ValueError as e:
+            libcalamares.utils.error(f"Error building zpool command: {e}")
+            # This should ideally not happen if _validate_new_pool is robust
+            # but good to have a fallback.
+            return None, None, f"<span foreground='red'>Error: {html.escape(str(e))}</span>"
+
+        # Let zpool check the command (busy disk, bad property, ...) while the dialog is
+        # still open, instead of failing later when Calamares runs it for real
+        dry_run_error = _zpool_dry_run(zpool_command_args)
+        if dry_run_error:
+            libcalamares.utils.error(f"zpool create dry run failed: {dry_run_error}")
+            return None, None, (
+                f"<span foreground='red'>zpool rejected this configuration: {html.escape(dry_run_error)}</span>")
+
+        updates["zfs_new_pool_name"] = collected_pool_name
+        # The 'install_dataset' for a new pool refers to the intended root filesystem dataset path *within* the new pool.
+        # e.g. if new pool is 'rpool' and dataset_entry is 'ROOT/pve', then install_dataset is 'rpool/ROOT/pve'
+        # However, zpool create only creates 'rpool'. 'ROOT/pve' must be created by subsequent zfs create commands.
+        # For now, store the user's intended root dataset path relative to the new pool.
+        install_dataset_on_new_pool = form["dataset"]
+        updates["zfs_install_dataset_relative"] = install_dataset_on_new_pool
+        # Full path of the install dataset, e.g. rpool/ROOT/pve; the chain below and
+        # selected['dataset'] both end with it
+        dataset_parts = install_dataset_on_new_pool.split('/')
+        if not all(dataset_parts): # _validate_new_pool rules this out; never hand over "pool/" or "pool//x"
+            libcalamares.utils.error(f"Empty dataset name in '{install_dataset_on_new_pool}'")
+            return None, None, "<span foreground='red'>Error: Root dataset name is empty.</span>"
+        install_dataset_path = f"{collected_pool_name}/{install_dataset_on_new_pool}"
+        # Every dataset from the pool down to the install dataset, parents first
+        # (e.g. rpool/ROOT, rpool/ROOT/pve). The last entry can be made in a single
+        # transaction with `zfs create -p`, which creates the missing parents too.
+        updates["zfs_dataset_chain"] = [
+            f"{collected_pool_name}/{'/'.join(dataset_parts[:i + 1])}" for i in range(len(dataset_parts))]
+
+
+        # Store global settings that also apply to new pool scenario
+        updates["zfs_arc_max_gb"] = advanced["arc_max_gb"]
+        updates["zfs_encryption_enabled"] = encryption_enabled
+        updates["zfs_encryption_password"] = form["encryption_password"]  # "" when disabled
+
+        # For the main 'selected' dict to return to Calamares core for summary
+        selected = {
+            'pool': collected_pool_name, # The new pool name
+            'dataset': install_dataset_path, # Full path for install
+            'mode': "new_pool", # Custom mode indicating new pool
+            'encryption_enabled': encryption_enabled,
+            # Not storing password in selected for security in logs
+            'encryption_algorithm': form["encryption_algorithm"]
+        }
+
+    else: # Use Existing Pool Mode
+        updates["zfs_operation_mode"] = "existing_pool"
+
+        pool_name = form["existing_pool_name"]
+        if pool_name is None: # Should be caught by _validate_existing_pool
+            return None, None, None # Closes without a selection
+
+        dataset_name_suffix = form["dataset"] # e.g. ROOT/proxmox
+
+        # Construct full dataset path
+        # If dataset_name_suffix contains '/', it's like "parent/child", use the part after first '/'
+        # Otherwise, assume it's a direct child of the pool_name.
+        # This logic might need refinement based on how users are expected to input dataset names.
+        # For now, assume dataset_entry is relative to the pool root if it doesn't contain the pool name.
+        if '/' in dataset_name_suffix:
+             actual_dataset_name = dataset_name_suffix # e.g. ROOT/proxmox
+        else: # E.g. user types 'mydata' -> pool_name/mydata
+             actual_dataset_name = dataset_name_suffix
+
+        full_dataset_path = f"{pool_name}/{actual_dataset_name}"
+
+
+        install_mode = form["install_mode"]
+        encryption_enabled = form["encryption_enabled"]
+
+        selected = {
+            'pool': pool_name,
+            'dataset': full_dataset_path, # This is the key Calamares uses for partitioning.
+            'mode': install_mode,
+            'encryption_enabled': encryption_enabled,
+            'encryption_password': form["encryption_password"], # For globalstorage
+            'encryption_algorithm': form["encryption_algorithm"]
+        }
+        # Store legacy globalstorage items for existing pool installs
+        updates["install_pool"] = selected['pool']
+        updates["install_dataset"] = selected['dataset'] # Full path
+        updates["install_mode"] = selected['mode']
+        updates["encryption_enabled"] = selected['encryption_enabled']
+        if selected['encryption_enabled']:
+            updates["encryption_password"] = selected['encryption_password']
+            updates["encryption_algorithm"] = selected['encryption_algorithm']
+        else: # Clear them if disabled
+             updates["encryption_password"] = ""
+             updates["encryption_algorithm"] = ""
+
+
+        # Global settings also apply here
+        updates["zfs_arc_max_gb"] = form["advanced"]["arc_max_gb"]
+        # For existing pools, encryption settings on datasets are more complex (inherit, on, off, new keys)
+        # The current UI implies setting encryption on the new dataset being created.
+        # If encryption is enabled, it means the new dataset should be encrypted.
+        updates["zfs_encryption_keyformat"] = "passphrase" if encryption_enabled else ""
+        updates["zfs_encryption_keylocation"] = "prompt" if encryption_enabled else ""
+
+
+    return selected, updates, None
+
+def _set_markup_if_changed(label, markup):
+    """Set label markup unless the label already shows exactly that markup."""
+    # get_label() returns the markup as last set, whichever code path set it
+    if label.get_label() != markup:
+        label.set_markup(markup)
 
 def pretty_name():
-    return "Select Installation Target"
+    return _tr("Select Installation Target")
 
 def run():
     """Show UI for selecting ZFS dataset"""
-    # Get detected pools from previous module
+    # Get detected pools from previous module (zfspooldetect). Contract, per pool name:
+    #   pool_status, pool_health  - from `zpool status`
+    #   existing_roots            - [{dataset, mountpoint, is_proxmox}], from a depth-limited `zfs list`
+    #   has_proxmox               - precomputed any(is_proxmox) over existing_roots
+    #   features, properties      - `zpool get` values
     pool_info = libcalamares.globalstorage.value("zfs_pools")
     if not pool_info:
         return ("No pools available", "No ZFS pools were detected in the previous step.")
@@ -46,8 +527,9 @@ def run():
         libcalamares.globalstorage.insert("encryption_algorithm", selected['encryption_algorithm'])
 
     # Log selection (without password)
-    encryption_info = {k: v for k, v in selected.items() if k != 'encryption_password'}
-    libcalamares.utils.debug(f"Selected: {encryption_info}")
+    if _DEBUG:
+        encryption_info = {k: v for k, v in selected.items() if k != 'encryption_password'}
+        libcalamares.utils.debug(f"Selected: {encryption_info}")
 
     return None
 
@@ -55,21 +537,80 @@ class ZFSTargetSelector:
     """Custom GTK dialog for ZFS target selection with encryption options"""
 
     def __init__(self, pool_info: Dict):
+        _load_gtk()
         self.pool_info = pool_info
+        # Pool list columns, materialized once; row i of the pool store is index i of each list
+        self._pool_soa = {"name": [], "status": [], "health": [], "info": []}
+        for name, info in (pool_info or {}).items():
+            self._pool_soa["name"].append(name)
+            self._pool_soa["status"].append(info['pool_status'])
+            self._pool_soa["health"].append(info['pool_health'])
+            self._pool_soa["info"].append("Has Proxmox" if info.get('has_proxmox') else "Empty")
+        # Root datasets per pool, for the per-keystroke "dataset already exists" check
+        self._pool_datasets = {
+            name: frozenset(r['dataset'] for r in info.get('existing_roots', []))
+            for name, info in (pool_info or {}).items()
+        }
         self.selected = None
-        self.builder = Gtk.Builder()
+        self._loop = None  # GLib.MainLoop while run() is waiting on the dialog
+        self._window_closed = False  # Set on destroy; late worker results are then ignored
+        self._profile_index = {name: i for i, name in enumerate(_WORKLOAD_PROFILES)}
+        self._custom_idx = self._profile_index["Custom"]
+        # Disk inventory is effectively immutable while the dialog is open; scan lazily once
+        self._cached_disks = None
+        self._cached_pool_disk_set = None  # See _pool_disk_set
+        # "available_disks_generation" the cached list was built from
+        self._disks_generation = None
+        # In-flight Gio.Subprocess for the lsblk scan, if any
+        self._lsblk_proc = None
+        # Bumped for every lsblk scan; a result tagged with an older id is stale and dropped
+        self._disk_scan_id = 0
+        # GLib source id of a queued _do_populate (0 = none queued)
+        self._populate_pending = 0
+        # Visibility flag read by the disk view's TreeModelFilter
+        self._show_disks = False
+        # Python-side mirror of the disk store (paths, row iters, toggle column), so hot paths don't walk the ListStore
+        self._all_disk_paths = []
+        self._disk_iters = []
+        # Name of the pool selected in the pool list, kept by on_pool_selected
+        self._selected_pool_name = None
+        # Selected disk paths in the order they were ticked (dict used as an ordered set);
+        # len() is the selected count, so nothing walks the store to count toggles
+        self._selected_disks = {}
+        # GLib source id of a queued validation pass, idle or typing timer (0 = none queued)
+        self._validate_pending = 0
+        # GLib source id of a queued advanced-settings update (0 = none queued)
+        self._advanced_pending = 0
+        # GLib source id of the password check waiting for typing to pause (0 = none queued)
+        self._password_pending = 0
+        # Advanced settings live here until their widgets are built on first expansion
+        self._advanced_built = False
+        # Advanced settings keyed like _ADVANCED_KEYS; the single source the summary, warnings
+        # and on_next read, kept current by on_advanced_setting_changed once the widgets exist
+        self._state = dict(_PROFILE_PRESETS["General Desktop"])
+        # Result of the last pool/dataset validation, reused when only the password fields are re-checked
+        self._selection_valid = False
+        self._selection_warning = ""
+        # Summary section name -> (input key, markup, warnings); see _update_summary_panel
+        self._summary_cache = {}
+        self._summary_warnings_text = None
+        # Combined input key of the last summary refresh
+        self._last_summary_key = None
         # Build UI
         self.build_ui()
 
     def build_ui(self):
         """Construct the selection interface"""
         # Main window
-        self.window = Gtk.Window(title="Select ZFS Installation Target")
+        self.window = Gtk.Window(title=_tr("Select ZFS Installation Target"))
         self.window.set_default_size(800, 650)  # Increased height for encryption options
         self.window.set_position(Gtk.WindowPosition.CENTER)
+        # Every way out (Next, Cancel, closing the window) ends in destroy, which ends run()
+        self.window.connect("destroy", self._on_window_destroy)
+        self._start_udev_monitor()
 
         # Main container
-        vbox = Gtk.VBox(spacing=10)
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
         vbox.set_margin_left(20)
         vbox.set_margin_right(20)
         vbox.set_margin_top(20)
@@ -77,75 +618,72 @@ class ZFSTargetSelector:
 
         # Header
         header = Gtk.Label()
-        header.set_markup("Select ZFS Pool and Dataset for Installation\n"
-                         "Choose where to install Proxmox VE")
+        header.set_markup(_tr("Select ZFS Pool and Dataset for Installation") + "\n" +
+                          _tr("Choose where to install Proxmox VE"))
         header.set_alignment(0, 0.5)
         vbox.pack_start(header, False, False, 0)
 
         # ===== Pool Mode Selection (Existing vs New) =====
-        pool_mode_hbox = Gtk.HBox(spacing=10)
+        pool_mode_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         pool_mode_hbox.set_homogeneous(True) # Make radio buttons take equal space
 
-        self.mode_use_existing_pool_radio = Gtk.RadioButton.new_with_label(None, "Use Existing ZFS Pool")
+        self.mode_use_existing_pool_radio = Gtk.RadioButton.new_with_label(None, _tr("Use Existing ZFS Pool"))
         self.mode_use_existing_pool_radio.connect("toggled", self.on_pool_mode_changed)
         pool_mode_hbox.pack_start(self.mode_use_existing_pool_radio, True, True, 0)
 
-        self.mode_create_new_pool_radio = Gtk.RadioButton.new_with_label_from_widget(self.mode_use_existing_pool_radio, "Create New ZFS Pool")
+        self.mode_create_new_pool_radio = Gtk.RadioButton.new_with_label_from_widget(self.mode_use_existing_pool_radio, _tr("Create New ZFS Pool"))
         self.mode_create_new_pool_radio.connect("toggled", self.on_pool_mode_changed)
         pool_mode_hbox.pack_start(self.mode_create_new_pool_radio, True, True, 0)
 
         vbox.pack_start(pool_mode_hbox, False, False, 5)
 
         # ===== Container for New Pool Creation UI =====
-        self.new_pool_vbox = Gtk.VBox(spacing=10)
+        self.new_pool_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
         # Disk Selection for New Pool
-        new_pool_disks_frame = Gtk.Frame(label="Select Disks for New Pool")
+        new_pool_disks_frame = Gtk.Frame(label=_tr("Select Disks for New Pool"))
         new_pool_disks_scroll = Gtk.ScrolledWindow()
         new_pool_disks_scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
         new_pool_disks_scroll.set_min_content_height(150) # Adjust as needed
 
         # Columns: Select (Toggle), Device, Model, Size
-        self.new_pool_disk_store = Gtk.ListStore(bool, str, str, str)
-        self.disk_selection_treeview = Gtk.TreeView(model=self.new_pool_disk_store)
+        # The master store is filled once per scan and kept across mode switches;
+        # the view shows it through a filter so switching modes only refilters.
+        self._master_disk_store = Gtk.ListStore(bool, str, str, str)
+        self._disk_filter = self._master_disk_store.filter_new()
+        self._disk_filter.set_visible_func(self._disk_visible)
+        self.disk_selection_treeview = Gtk.TreeView(model=self._disk_filter)
 
         # Col 0: Selection Toggle
         renderer_toggle = Gtk.CellRendererToggle()
         renderer_toggle.connect("toggled", self.on_disk_selection_toggled)
-        column_toggle = Gtk.TreeViewColumn("Select", renderer_toggle, active=0)
+        column_toggle = Gtk.TreeViewColumn(_tr("Select"), renderer_toggle, active=0)
         self.disk_selection_treeview.append_column(column_toggle)
 
         for i, title in enumerate(["Device", "Model", "Size"]):
             renderer = Gtk.CellRendererText()
-            column = Gtk.TreeViewColumn(title, renderer, text=i + 1) # Offset by 1 due to toggle col
+            column = Gtk.TreeViewColumn(_tr(title), renderer, text=i + 1) # Offset by 1 due to toggle col
             column.set_resizable(True)
             self.disk_selection_treeview.append_column(column)
 
-        # TODO: Populate self.new_pool_disk_store with available disks (from a globalstorage var or helper)
-        # Example: self.new_pool_disk_store.append([False, "/dev/sda", "Samsung SSD 870 EVO", "500GB"])
-
         new_pool_disks_scroll.add(self.disk_selection_treeview)
         new_pool_disks_frame.add(new_pool_disks_scroll)
         self.new_pool_vbox.pack_start(new_pool_disks_frame, True, True, 0)
 
         # RAID Type for New Pool
-        new_pool_raid_hbox = Gtk.HBox(spacing=10)
-        new_pool_raid_label = Gtk.Label("RAID Type:")
-        self.new_pool_raid_type_combo = Gtk.ComboBoxText()
-        raid_types = ["stripe", "mirror", "raidz1", "raidz2", "raidz3"]
-        for r_type in raid_types:
-            self.new_pool_raid_type_combo.append_text(r_type)
-        self.new_pool_raid_type_combo.set_active(0) # Default to stripe
+        new_pool_raid_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        new_pool_raid_label = Gtk.Label(_tr("RAID Type:"))
+        self.new_pool_raid_type_combo = _option_combo(_RAID_TYPES, 0) # Default to stripe
         self.new_pool_raid_type_combo.connect("changed", self.on_new_pool_config_changed)
         new_pool_raid_hbox.pack_start(new_pool_raid_label, False, False, 0)
         new_pool_raid_hbox.pack_start(self.new_pool_raid_type_combo, True, True, 0)
         self.new_pool_vbox.pack_start(new_pool_raid_hbox, False, False, 0)
 
         # New Pool Name
-        new_pool_name_hbox = Gtk.HBox(spacing=10)
-        new_pool_name_label = Gtk.Label("New Pool Name:")
+        new_pool_name_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        new_pool_name_label = Gtk.Label(_tr("New Pool Name:"))
         self.new_pool_name_entry = Gtk.Entry()
         self.new_pool_name_entry.set_text("rpool") # Common default for root pool
-        self.new_pool_name_entry.connect("changed", self.on_new_pool_config_changed)
+        self.new_pool_name_entry.connect("changed", self._on_entry_changed)
         new_pool_name_hbox.pack_start(new_pool_name_label, False, False, 0)
         new_pool_name_hbox.pack_start(self.new_pool_name_entry, True, True, 0)
         self.new_pool_vbox.pack_start(new_pool_name_hbox, False, False, 0)
@@ -154,20 +692,16 @@ class ZFSTargetSelector:
 
 
         # Workload Profile Selection (self.workload_frame already defined)
-        self.workload_frame = Gtk.Frame(label="Workload Profile & ZFS Properties") # Renamed for clarity
-        workload_hbox = Gtk.HBox(spacing=10)
+        self.workload_frame = Gtk.Frame(label=_tr("Workload Profile & ZFS Properties")) # Renamed for clarity
+        workload_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         workload_hbox.set_margin_left(10)
         workload_hbox.set_margin_right(10)
         workload_hbox.set_margin_top(10)
         workload_hbox.set_margin_bottom(10)
 
-        workload_label = Gtk.Label("Select a profile:") # This label is inside the frame
-        self.workload_combo = Gtk.ComboBoxText()
-        self.workload_profiles = ["General Desktop", "Virtual Machine Host", "Bulk File Storage/NAS", "Custom"]
-        for profile in self.workload_profiles:
-            self.workload_combo.append_text(profile)
-        self.workload_combo.set_active(0)
-        self.workload_combo.connect("changed", self.on_workload_profile_changed)
+        workload_label = Gtk.Label(_tr("Select a profile:")) # This label is inside the frame
+        self.workload_combo = _option_combo(_WORKLOAD_PROFILES, 0)
+        self._workload_handler = self.workload_combo.connect("changed", self.on_workload_profile_changed)
 
         workload_hbox.pack_start(workload_label, False, False, 0)
         workload_hbox.pack_start(self.workload_combo, True, True, 0)
@@ -175,38 +709,42 @@ class ZFSTargetSelector:
         vbox.pack_start(self.workload_frame, False, False, 5)
 
         # Pool list (self.pool_frame already defined)
-        self.pool_frame = Gtk.Frame(label="Available ZFS Pools")
+        self.pool_frame = Gtk.Frame(label=_tr("Available ZFS Pools"))
         pool_scroll = Gtk.ScrolledWindow()
         pool_scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
         pool_scroll.set_min_content_height(200)
 
         # Create tree view for pools
         self.pool_store = Gtk.ListStore(str, str, str, str)
-        self.pool_tree = Gtk.TreeView(model=self.pool_store)
+        # FAULTED pools can't take an install; hide them rather than let them be picked
+        self._pool_filter = self.pool_store.filter_new()
+        self._pool_filter.set_visible_func(self._pool_visible)
+        self.pool_tree = Gtk.TreeView(model=self._pool_filter)
 
         for i, title in enumerate(["Pool Name", "Status", "Health", "Information"]):
             renderer = Gtk.CellRendererText()
-            column = Gtk.TreeViewColumn(title, renderer, text=i)
+            column = Gtk.TreeViewColumn(_tr(title), renderer, text=i)
             column.set_resizable(True)
             self.pool_tree.append_column(column)
 
-        if self.pool_info: # Check if pool_info is not None
-            for pool_name, info in self.pool_info.items():
-                existing = "Has Proxmox" if any(r['is_proxmox'] for r in info['existing_roots']) else "Empty"
-                self.pool_store.append([
-                    pool_name,
-                    info['pool_status'],
-                    info['pool_health'],
-                    existing
-                ])
+        if self._pool_soa["name"]:
+            # Detach the model during the bulk load so the view doesn't react per row
+            self.pool_tree.set_model(None)
+            self.pool_store.freeze_notify()
+            soa = self._pool_soa
+            for row in zip(soa["name"], soa["status"], soa["health"], soa["info"]):
+                self.pool_store.insert_with_valuesv(-1, _STORE_COLUMNS, row)
+            self.pool_store.thaw_notify()
+            self._pool_filter.refilter()
+            self.pool_tree.set_model(self._pool_filter)
 
         pool_scroll.add(self.pool_tree)
         self.pool_frame.add(pool_scroll)
         vbox.pack_start(self.pool_frame, True, True, 0)
 
-        # Installation mode selection (self.mode_frame already defined)
-        self.mode_frame = Gtk.Frame(label="Installation Mode (on selected existing pool)")
-        mode_vbox = Gtk.VBox(spacing=5)
+        # Installation mode selection
+        self.mode_frame = Gtk.Frame(label=_tr("Installation Mode (on selected existing pool)"))
+        mode_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
         mode_vbox.set_margin_left(10)
         mode_vbox.set_margin_right(10)
         mode_vbox.set_margin_top(10)
@@ -214,30 +752,30 @@ class ZFSTargetSelector:
 
         # Radio buttons for mode
         self.mode_new = Gtk.RadioButton.new_with_label_from_widget(
-            None, "Create new root dataset (recommended for clean install)"
+            None, _tr("Create new root dataset (recommended for clean install)")
         )
         self.mode_replace = Gtk.RadioButton.new_with_label_from_widget(
-            self.mode_new, "Replace existing Proxmox installation (preserves pool layout)"
+            self.mode_new, _tr("Replace existing Proxmox installation (preserves pool layout)")
         )
         self.mode_alongside = Gtk.RadioButton.new_with_label_from_widget(
-            self.mode_new, "Install alongside existing (dual-boot configuration)"
+            self.mode_new, _tr("Install alongside existing (dual-boot configuration)")
         )
 
         mode_vbox.pack_start(self.mode_new, False, False, 0)
         mode_vbox.pack_start(self.mode_replace, False, False, 0)
         mode_vbox.pack_start(self.mode_alongside, False, False, 0)
-        mode_frame.add(mode_vbox)
-        vbox.pack_start(mode_frame, False, False, 0)
+        self.mode_frame.add(mode_vbox)
+        vbox.pack_start(self.mode_frame, False, False, 0)
 
         # Dataset name entry
-        dataset_frame = Gtk.Frame(label="Target Dataset")
-        dataset_hbox = Gtk.HBox(spacing=10)
+        dataset_frame = Gtk.Frame(label=_tr("Target Dataset"))
+        dataset_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         dataset_hbox.set_margin_left(10)
         dataset_hbox.set_margin_right(10)
         dataset_hbox.set_margin_top(10)
         dataset_hbox.set_margin_bottom(10)
 
-        dataset_label = Gtk.Label("Dataset name:")
+        dataset_label = Gtk.Label(_tr("Dataset name:"))
         self.dataset_entry = Gtk.Entry()
         self.dataset_entry.set_text("ROOT/proxmox")
         self.dataset_entry.set_width_chars(30)
@@ -248,248 +786,35 @@ class ZFSTargetSelector:
         vbox.pack_start(dataset_frame, False, False, 0)
 
         # ===== ADVANCED ZFS SETTINGS EXPANDER =====
-        self.advanced_expander = Gtk.Expander(label="Advanced ZFS Settings")
+        self.advanced_expander = Gtk.Expander(label=_tr("Advanced ZFS Settings"))
         self.advanced_expander.set_expanded(False) # Collapsed by default
         self.advanced_expander.connect("notify::expanded", self.on_advanced_expander_toggled)
 
-        advanced_vbox = Gtk.VBox(spacing=6)
-        advanced_vbox.set_margin_left(10) # Indent content
-        advanced_vbox.set_margin_right(10)
-        advanced_vbox.set_margin_top(6)
-        advanced_vbox.set_margin_bottom(6)
-        self.advanced_expander.add(advanced_vbox) # Add VBox to Expander
-
-        # --- ashift ---
-        ashift_hbox = Gtk.HBox(spacing=10)
-        ashift_label = Gtk.Label("ashift:")
-        self.ashift_combo = Gtk.ComboBoxText()
-        self.ashift_options = ["Auto-detect", "9", "12", "13"]
-        for opt in self.ashift_options:
-            self.ashift_combo.append_text(opt)
-        self.ashift_combo.set_active(0)
-        self.ashift_combo.connect("changed", self.on_advanced_setting_changed)
-        ashift_hbox.pack_start(ashift_label, False, False, 0)
-        ashift_hbox.pack_start(self.ashift_combo, True, True, 0)
-        self.ashift_help_button = Gtk.Button(label=" (?)")
-        self.ashift_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.ashift_help_button.set_tooltip_text(
-            "ashift determines the block size alignment for the pool (2^ashift). "
-            "'Auto-detect' is strongly recommended. Setting this incorrectly can severely "
-            "degrade performance and is permanent. Common values for modern drives are "
-            "12 (4K sectors) or 13 (8K sectors). Consult OpenZFS documentation for your specific hardware."
-        )
-        ashift_hbox.pack_start(self.ashift_help_button, False, False, 0)
-        advanced_vbox.pack_start(ashift_hbox, False, False, 0)
-
-        self.ashift_warning_label = Gtk.Label()
-        self.ashift_warning_label.set_line_wrap(True)
-        self.ashift_warning_label.set_markup("")
-        advanced_vbox.pack_start(self.ashift_warning_label, False, False, 5)
-
-        # --- Compression ---
-        compression_hbox = Gtk.HBox(spacing=10)
-        comp_label = Gtk.Label("Compression:")
-        self.compression_algo_combo = Gtk.ComboBoxText()
-        self.compression_options = ["lz4", "zstd", "gzip", "off"]
-        for opt in self.compression_options:
-            self.compression_algo_combo.append_text(opt)
-        self.compression_algo_combo.set_active(0) # lz4 default
-        self.compression_algo_combo.connect("changed", self.on_advanced_setting_changed)
-        compression_hbox.pack_start(comp_label, False, False, 0)
-        compression_hbox.pack_start(self.compression_algo_combo, True, True, 0)
-        self.compression_algo_help_button = Gtk.Button(label=" (?)")
-        self.compression_algo_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.compression_algo_help_button.set_tooltip_text(
-            "Selects the compression algorithm for the ZFS datasets. `lz4` is fast and generally recommended. "
-            "`zstd` offers better compression at higher CPU cost (see Zstd Level). `gzip` is older and slower. "
-            "`off` disables compression. See OpenZFS docs for benchmarks."
-        )
-        compression_hbox.pack_start(self.compression_algo_help_button, False, False, 0)
-        advanced_vbox.pack_start(compression_hbox, False, False, 0)
-
-
-        self.zstd_level_hbox = Gtk.HBox(spacing=10) # HBox for Zstd level
-        zstd_label = Gtk.Label("Zstd Level:")
-        self.zstd_level_scale = Gtk.Scale.new_with_range(Gtk.Orientation.HORIZONTAL, 1, 19, 1)
-        self.zstd_level_scale.set_value(3) # Default Zstd level
-        self.zstd_level_scale.set_digits(0)
-        self.zstd_level_scale.set_hexpand(True)
-        self.zstd_level_scale.connect("value-changed", self.on_advanced_setting_changed)
-        self.zstd_level_hbox.pack_start(zstd_label, False, False, 0)
-        self.zstd_level_hbox.pack_start(self.zstd_level_scale, True, True, 0)
-        self.zstd_level_help_button = Gtk.Button(label=" (?)")
-        self.zstd_level_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.zstd_level_help_button.set_tooltip_text(
-             "Zstd compression level (1-19). Higher levels use more CPU for potentially better compression ratio. "
-             "Levels 1-3 are fast, 4-9 good balance. Levels 10+ have significant CPU cost. Test your workload!"
-        )
-        self.zstd_level_hbox.pack_start(self.zstd_level_help_button, False, False, 0)
-        advanced_vbox.pack_start(self.zstd_level_hbox, False, False, 0)
-
-
-        self.compression_helper_label = Gtk.Label()
-        self.compression_helper_label.set_line_wrap(True)
-        self.compression_helper_label.set_markup("")
-        advanced_vbox.pack_start(self.compression_helper_label, False, False, 5)
-
-        # --- Core Filesystem Properties (Grid) ---
-        props_grid = Gtk.Grid()
-        props_grid.set_column_spacing(10)
-        props_grid.set_row_spacing(5)
-
-        # Record Size
-        rs_label = Gtk.Label("Record Size:")
-        self.recordsize_combo = Gtk.ComboBoxText()
-        self.recordsize_options = ["Default (128K)", "16K", "64K", "256K", "512K", "1M"]
-        for opt in self.recordsize_options:
-            self.recordsize_combo.append_text(opt)
-        self.recordsize_combo.set_active(0)
-        self.recordsize_combo.connect("changed", self.on_advanced_setting_changed)
-        props_grid.attach(rs_label, 0, 0, 1, 1)
-        props_grid.attach(self.recordsize_combo, 1, 0, 1, 1)
-        self.recordsize_help_button = Gtk.Button(label=" (?)")
-        self.recordsize_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.recordsize_help_button.set_tooltip_text(
-            "`recordsize` (or block size) for files. Default 128K is good for general use. "
-            "Databases might prefer smaller (e.g., 16K-64K for random I/O). "
-            "Large sequential files (video, backups) might benefit from larger (e.g., 1M). "
-            "Mismatched recordsize to workload can impact performance."
-        )
-        props_grid.attach(self.recordsize_help_button, 2, 0, 1, 1)
-
-
-        # atime
-        atime_label = Gtk.Label("atime:")
-        self.atime_combo = Gtk.ComboBoxText()
-        self.atime_options = ["relatime", "off", "on"]
-        for opt in self.atime_options:
-            self.atime_combo.append_text(opt)
-        self.atime_combo.set_active(0) # relatime default
-        self.atime_combo.connect("changed", self.on_advanced_setting_changed)
-        props_grid.attach(atime_label, 0, 1, 1, 1)
-        props_grid.attach(self.atime_combo, 1, 1, 1, 1)
-        self.atime_help_button = Gtk.Button(label=" (?)")
-        self.atime_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.atime_help_button.set_tooltip_text(
-            "Controls how access times are updated. `relatime` (default) updates if previous atime is older than mtime/ctime. "
-            "`off` provides a performance boost by not updating atime, good for servers/VMs. `on` updates atime on every access."
-        )
-        props_grid.attach(self.atime_help_button, 2, 1, 1, 1)
-
-        # xattr
-        xattr_label = Gtk.Label("xattr:")
-        self.xattr_combo = Gtk.ComboBoxText()
-        self.xattr_options = ["sa", "posix"]
-        for opt in self.xattr_options:
-            self.xattr_combo.append_text(opt)
-        self.xattr_combo.set_active(0) # sa default
-        self.xattr_combo.connect("changed", self.on_advanced_setting_changed)
-        props_grid.attach(xattr_label, 0, 2, 1, 1)
-        props_grid.attach(self.xattr_combo, 1, 2, 1, 1)
-        self.xattr_help_button = Gtk.Button(label=" (?)")
-        self.xattr_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.xattr_help_button.set_tooltip_text(
-            "`sa` (System Attribute based) stores small xattrs directly in the inode, efficient for ACLs/SELinux. "
-            "`posix` stores them in hidden subdirectories, more compatible but can be slower."
-        )
-        props_grid.attach(self.xattr_help_button, 2, 2, 1, 1)
-
-        # dnodesize
-        dnodesize_label = Gtk.Label("dnodesize:")
-        self.dnodesize_combo = Gtk.ComboBoxText()
-        self.dnodesize_options = ["auto", "legacy"]
-        for opt in self.dnodesize_options:
-            self.dnodesize_combo.append_text(opt)
-        self.dnodesize_combo.set_active(0) # auto default
-        self.dnodesize_combo.connect("changed", self.on_advanced_setting_changed)
-        props_grid.attach(dnodesize_label, 0, 3, 1, 1)
-        props_grid.attach(self.dnodesize_combo, 1, 3, 1, 1)
-        self.dnodesize_help_button = Gtk.Button(label=" (?)")
-        self.dnodesize_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.dnodesize_help_button.set_tooltip_text(
-            "Size of dnodes. `auto` is usually best. `legacy` uses an older, smaller dnode size. "
-            "Relevant for xattr=sa, as larger dnodes can store more SA xattrs."
-        )
-        props_grid.attach(self.dnodesize_help_button, 2, 3, 1, 1)
-
-
-        advanced_vbox.pack_start(props_grid, False, False, 5)
-
-        # --- ARC Max Size ---
-        arc_hbox = Gtk.HBox(spacing=10)
-        arc_label = Gtk.Label("ARC Max Size (GB):")
-        # Adjustment: min=0 (auto), max=sensible limit (e.g. 512GB or 1024GB), step=1GB
-        arc_adjustment = Gtk.Adjustment(value=0, lower=0, upper=512, step_increment=1, page_increment=8, page_size=0)
-        self.arc_max_gb_spinbutton = Gtk.SpinButton(adjustment=arc_adjustment, climb_rate=1, digits=0)
-        self.arc_max_gb_spinbutton.connect("value-changed", self.on_advanced_setting_changed)
-        arc_hbox.pack_start(arc_label, False, False, 0)
-        arc_hbox.pack_start(self.arc_max_gb_spinbutton, True, True, 0)
-        self.arc_max_help_button = Gtk.Button(label=" (?)")
-        self.arc_max_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.arc_max_help_button.set_tooltip_text(
-            "Maximum size of the Adaptive Replacement Cache (ARC) in Gigabytes. ARC is ZFS's primary disk cache in RAM. "
-            "0 GB means 'auto' (typically 50% of system RAM). Manual tuning is for specific needs. "
-            "Too small can hurt performance; too large can starve applications of RAM."
-        )
-        arc_hbox.pack_start(self.arc_max_help_button, False, False, 0)
-        advanced_vbox.pack_start(arc_hbox, False, False, 0)
-
-
-        self.arc_warning_label = Gtk.Label()
-        self.arc_warning_label.set_line_wrap(True)
-        self.arc_warning_label.set_markup("0 GB means auto (typically 50% of RAM). Check ZFS docs for details.")
-        advanced_vbox.pack_start(self.arc_warning_label, False, False, 5)
-
-        # --- L2ARC Devices ---
-        l2arc_hbox = Gtk.HBox(spacing=10)
-        l2arc_label = Gtk.Label("L2ARC Device(s):")
-        self.l2arc_devices_entry = Gtk.Entry()
-        self.l2arc_devices_entry.set_placeholder_text("/dev/sdx /dev/sdy (optional, space-separated)")
-        self.l2arc_devices_entry.connect("changed", self.on_advanced_setting_changed)
-        l2arc_hbox.pack_start(l2arc_label, False, False, 0)
-        l2arc_hbox.pack_start(self.l2arc_devices_entry, True, True, 0)
-        self.l2arc_devices_help_button = Gtk.Button(label=" (?)")
-        self.l2arc_devices_help_button.set_relief(Gtk.ReliefStyle.NONE)
-        self.l2arc_devices_help_button.set_tooltip_text(
-            "Secondary ARC (L2ARC) devices. Enter space-separated paths to fast SSD partitions (e.g., /dev/sdb1 /dev/sdc1). "
-            "L2ARC caches MAINLY metadata and RANDOM SMALL blocks by default (not large sequential reads). "
-            "It can improve performance for specific workloads but adds complexity and uses some RAM. "
-            "Ensure devices are dedicated and persistent."
-        )
-        l2arc_hbox.pack_start(self.l2arc_devices_help_button, False, False, 0)
-        advanced_vbox.pack_start(l2arc_hbox, False, False, 0)
-
-
-        self.l2arc_warning_label = Gtk.Label()
-        self.l2arc_warning_label.set_line_wrap(True)
-        self.l2arc_warning_label.set_markup(
-            "<small>Enter space-separated full device paths (e.g., /dev/nvme0n1pSpecial /dev/disk/by-id/...). "
-            "Ensure these are fast SSDs not used for other purposes. Incorrect devices can degrade performance or cause data loss on L2ARC.</small>"
-        )
-        advanced_vbox.pack_start(self.l2arc_warning_label, False, False, 5)
-
-        # Initially update visibility of zstd slider and helper texts
-        self._update_compression_ui_elements()
-        self._update_ashift_warning()
-        self._update_arc_warning() # Initial call for ARC warning
+        # Filled by _build_advanced_widgets the first time the expander opens
+        self._advanced_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+        self._advanced_vbox.set_margin_left(10) # Indent content
+        self._advanced_vbox.set_margin_right(10)
+        self._advanced_vbox.set_margin_top(6)
+        self._advanced_vbox.set_margin_bottom(6)
+        self.advanced_expander.add(self._advanced_vbox) # Add VBox to Expander
 
         vbox.pack_start(self.advanced_expander, False, False, 5) # Added padding
 
         # ===== ENCRYPTION OPTIONS =====
-        encryption_frame = Gtk.Frame(label="Full Disk Encryption")
-        encryption_vbox = Gtk.VBox(spacing=10)
+        encryption_frame = Gtk.Frame(label=_tr("Full Disk Encryption"))
+        encryption_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
         encryption_vbox.set_margin_left(10)
         encryption_vbox.set_margin_right(10)
         encryption_vbox.set_margin_top(10)
         encryption_vbox.set_margin_bottom(10)
 
         # Enable encryption checkbox
-        self.encryption_check = Gtk.CheckButton(label="Enable Full Disk Encryption")
+        self.encryption_check = Gtk.CheckButton(label=_tr("Enable Full Disk Encryption"))
         encryption_vbox.pack_start(self.encryption_check, False, False, 0)
 
         # Password fields
-        password_hbox = Gtk.HBox(spacing=10)
-        password_label = Gtk.Label("Password:")
+        password_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        password_label = Gtk.Label(_tr("Password:"))
         self.password_entry = Gtk.Entry()
         self.password_entry.set_visibility(False)
         self.password_entry.set_width_chars(30)
@@ -498,8 +823,8 @@ class ZFSTargetSelector:
         encryption_vbox.pack_start(password_hbox, False, False, 0)
 
         # Confirm password
-        confirm_hbox = Gtk.HBox(spacing=10)
-        confirm_label = Gtk.Label("Confirm Password:")
+        confirm_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        confirm_label = Gtk.Label(_tr("Confirm Password:"))
         self.confirm_entry = Gtk.Entry()
         self.confirm_entry.set_visibility(False)
         self.confirm_entry.set_width_chars(30)
@@ -508,12 +833,9 @@ class ZFSTargetSelector:
         encryption_vbox.pack_start(confirm_hbox, False, False, 0)
 
         # Encryption algorithm
-        algorithm_hbox = Gtk.HBox(spacing=10)
-        algorithm_label = Gtk.Label("Encryption Algorithm:")
-        self.algorithm_combo = Gtk.ComboBoxText()
-        for algo in ["aes-256-gcm", "aes-256-ccm", "chacha20-poly1305"]:
-            self.algorithm_combo.append_text(algo)
-        self.algorithm_combo.set_active(0)  # Default to aes-256-gcm
+        algorithm_hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        algorithm_label = Gtk.Label(_tr("Encryption Algorithm:"))
+        self.algorithm_combo = _option_combo(_ENCRYPTION_ALGORITHMS, 0)  # Default to aes-256-gcm
         algorithm_hbox.pack_start(algorithm_label, False, False, 0)
         algorithm_hbox.pack_start(self.algorithm_combo, True, True, 0)
         encryption_vbox.pack_start(algorithm_hbox, False, False, 0)
@@ -527,17 +849,24 @@ class ZFSTargetSelector:
         vbox.pack_start(self.encryption_status, False, False, 0)
 
         # ===== CONFIGURATION SUMMARY PANEL =====
-        self.summary_frame = Gtk.Frame(label="Configuration Summary")
-        summary_vbox = Gtk.VBox() # Use a VBox for potential multiple labels or controls later
+        self.summary_frame = Gtk.Frame(label=_tr("Configuration Summary"))
+        summary_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL) # One label per summary section, see _update_summary_panel
         summary_vbox.set_margin_left(10)
         summary_vbox.set_margin_right(10)
         summary_vbox.set_margin_top(10)
         summary_vbox.set_margin_bottom(10)
-        self.summary_label = Gtk.Label(label="Summary will appear here.")
-        self.summary_label.set_line_wrap(True)
-        self.summary_label.set_xalign(0) # Align text to the left
-        self.summary_label.set_selectable(True)
-        summary_vbox.pack_start(self.summary_label, True, True, 0)
+        # Small font is set once here instead of wrapping every refresh in <small> markup
+        summary_font = Pango.FontDescription("9")
+        self._summary_labels = {}
+        for name in _SUMMARY_SECTIONS + ("warnings",):
+            label = Gtk.Label()
+            label.set_line_wrap(True)
+            label.set_xalign(0) # Align text to the left
+            label.set_selectable(True)
+            label.override_font(summary_font)
+            summary_vbox.pack_start(label, False, False, 0)
+            self._summary_labels[name] = label
+        self._summary_labels["workload"].set_text("Summary will appear here.")
         self.summary_frame.add(summary_vbox)
         vbox.pack_start(self.summary_frame, False, False, 10) # Add some padding before buttons
 
@@ -548,19 +877,19 @@ class ZFSTargetSelector:
 
 
         # Button box
-        self.button_box = Gtk.HButtonBox() # Made it self.button_box
+        self.button_box = Gtk.ButtonBox(orientation=Gtk.Orientation.HORIZONTAL) # Made it self.button_box
         self.button_box.set_layout(Gtk.ButtonBoxStyle.END)
         self.button_box.set_spacing(10)
 
-        self.reset_button = Gtk.Button(label="Reset to Recommended Defaults")
+        self.reset_button = Gtk.Button(label=_tr("Reset to Recommended Defaults"))
         self.reset_button.connect("clicked", self.on_reset_to_defaults_clicked)
         # Pack reset button on the start/left side of the end-aligned box
         self.button_box.pack_start(self.reset_button, False, False, 0)
 
 
-        cancel_button = Gtk.Button(label="Cancel")
+        cancel_button = Gtk.Button(label=_tr("Cancel"))
         cancel_button.connect("clicked", self.on_cancel)
-        self.next_button = Gtk.Button(label="Next")
+        self.next_button = Gtk.Button(label=_tr("Next"))
         self.next_button.connect("clicked", self.on_next)
         self.next_button.set_sensitive(False)
 
@@ -575,113 +904,416 @@ class ZFSTargetSelector:
         self.mode_new.connect("toggled", self.on_mode_changed)
         self.mode_replace.connect("toggled", self.on_mode_changed)
         self.mode_alongside.connect("toggled", self.on_mode_changed)
-        self.dataset_entry.connect("changed", self.validate_selection)
+        self.dataset_entry.connect("changed", self._on_entry_changed)
 
         # Encryption signals
         self.encryption_check.connect("toggled", self.on_encryption_toggled)
-        self.password_entry.connect("changed", self.validate_selection)
-        self.confirm_entry.connect("changed", self.validate_selection)
-        self.algorithm_combo.connect("changed", self.validate_selection)
+        # Password match is checked once typing pauses or the field loses focus, not per keystroke
+        for entry in (self.password_entry, self.confirm_entry):
+            entry.connect("changed", self._on_password_changed)
+            entry.connect("focus-out-event", self._on_password_focus_out)
+        self.algorithm_combo.connect("changed", self._schedule_validate)
 
         # Initialize encryption widget states
         self.on_encryption_toggled(self.encryption_check)
 
         # Initial population of summary panel and UI state
-        self._update_summary_panel()
         self.on_pool_mode_changed(self.mode_use_existing_pool_radio) # Set initial visibility
 
         # Add to window
         self.window.add(vbox)
         self.window.show_all()
 
-    def _populate_available_disks(self):
-        """Populates the disk selection treeview with available disks."""
-        self.new_pool_disk_store.clear()
-        try:
-            # Using path for device name as it's more reliable for ZFS. Name can be like 'sda'.
-            cmd = ["lsblk", "-dJO", "name,path,model,size,type,tran", "--exclude", "7,1"]
-            libcalamares.utils.debug(f"Running command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            data = json.loads(result.stdout)
-            libcalamares.utils.debug(f"lsblk output: {data}")
-
-            # Get paths of disks already in use by imported ZFS pools
-            # This is a simplified check. A more robust check would involve parsing `zpool status -vLP`
-            # or checking mount points more thoroughly.
-            disks_in_existing_pools = set()
-            if self.pool_info:
-                 for pool_name, p_info in self.pool_info.items():
-                    if 'vdevs' in p_info: # Assuming zfspooledetect provides vdev info
-                        for vdev in p_info['vdevs']:
-                            # This is highly dependent on zfspooledetect output structure
-                            if 'path' in vdev and vdev['path']:
-                                disks_in_existing_pools.add(os.path.realpath(vdev['path'])) # Use realpath to resolve symlinks
-                            elif 'name' in vdev and vdev['name']: # Fallback if path not available
-                                disks_in_existing_pools.add(os.path.realpath(f"/dev/{vdev['name']}"))
-
-
-            libcalamares.utils.debug(f"Disks in existing ZFS pools: {disks_in_existing_pools}")
-
-            for device in data.get("blockdevices", []):
-                if device.get("type") == "disk":
-                    dev_path = device.get("path", f"/dev/{device.get('name')}")
-
-                    # Basic check to exclude root disk of live system (very simplistic)
-                    # A more robust check would involve checking mount points from Calamares's system information.
-                    if dev_path == "/dev/sda" and os.path.exists("/live/medium"): # Example common live media path
-                        libcalamares.utils.debug(f"Skipping likely live media disk: {dev_path}")
-                        continue
+    def _build_advanced_widgets(self):
+        """Build the Advanced ZFS Settings widgets, initialized from self._state.
+
+        Most users never open the expander, so this runs on its first expansion
+        rather than in build_ui.
+        """
+        values = self._state
+
+        # One grid for every row: label in column 0, input in column 1. Helper and
+        # warning labels span both columns on their own row.
+        grid = Gtk.Grid()
+        grid.set_column_spacing(10)
+        grid.set_row_spacing(5)
+        row = 0
+
+        def attach_row(label, widget, key):
+            nonlocal row
+            label.set_halign(Gtk.Align.START)
+            # The label carries the setting's help text; see _on_advanced_tooltip
+            label.set_name(key)
+            label.set_has_tooltip(True)
+            label.connect("query-tooltip", self._on_advanced_tooltip)
+            widget.set_hexpand(True)
+            grid.attach(label, 0, row, 1, 1)
+            grid.attach(widget, 1, row, 1, 1)
+            row += 1
+
+        def attach_note(label):
+            nonlocal row
+            label.set_line_wrap(True)
+            grid.attach(label, 0, row, 2, 1)
+            row += 1
 
-                    # Exclude disks already part of an imported ZFS pool
-                    if os.path.realpath(dev_path) in disks_in_existing_pools:
-                        libcalamares.utils.debug(f"Skipping disk {dev_path} already in an imported ZFS pool.")
-                        continue
+        # --- ashift ---
+        ashift_label = Gtk.Label(_tr("ashift:"))
+        self.ashift_combo = _option_combo(_ASHIFT_OPTIONS, _COMBO_INDEX["ashift"][values["ashift"]])
+        attach_row(ashift_label, self.ashift_combo, "ashift")
+
+        self.ashift_warning_label = Gtk.Label()
+        self.ashift_warning_label.set_markup("")
+        attach_note(self.ashift_warning_label)
+
+        # --- Compression ---
+        comp_label = Gtk.Label(_tr("Compression:"))
+        self.compression_algo_combo = _option_combo(_COMPRESSION_OPTIONS, _COMBO_INDEX["compression"][values["compression"]])
+        attach_row(comp_label, self.compression_algo_combo, "compression")
+
+        zstd_label = Gtk.Label(_tr("Zstd Level:"))
+        self.zstd_level_scale = Gtk.Scale.new_with_range(Gtk.Orientation.HORIZONTAL, 1, 19, 1)
+        self.zstd_level_scale.set_value(values["zstd_level"])
+        self.zstd_level_scale.set_digits(0)
+        attach_row(zstd_label, self.zstd_level_scale, "zstd_level")
+        # Shown only while zstd is selected (see _update_compression_ui_elements)
+        self._zstd_level_row = (zstd_label, self.zstd_level_scale)
+
+        self.compression_helper_label = Gtk.Label()
+        self.compression_helper_label.set_markup("")
+        attach_note(self.compression_helper_label)
+
+        # --- Core Filesystem Properties ---
+        rs_label = Gtk.Label(_tr("Record Size:"))
+        self.recordsize_combo = _option_combo(_RECORDSIZE_OPTIONS, _COMBO_INDEX["recordsize"][values["recordsize"]])
+        attach_row(rs_label, self.recordsize_combo, "recordsize")
+
+        atime_label = Gtk.Label(_tr("atime:"))
+        self.atime_combo = _option_combo(_ATIME_OPTIONS, _COMBO_INDEX["atime"][values["atime"]])
+        attach_row(atime_label, self.atime_combo, "atime")
+
+        xattr_label = Gtk.Label(_tr("xattr:"))
+        self.xattr_combo = _option_combo(_XATTR_OPTIONS, _COMBO_INDEX["xattr"][values["xattr"]])
+        attach_row(xattr_label, self.xattr_combo, "xattr")
+
+        dnodesize_label = Gtk.Label(_tr("dnodesize:"))
+        self.dnodesize_combo = _option_combo(_DNODESIZE_OPTIONS, _COMBO_INDEX["dnodesize"][values["dnodesize"]])
+        attach_row(dnodesize_label, self.dnodesize_combo, "dnodesize")
+
+        # --- ARC Max Size ---
+        arc_label = Gtk.Label(_tr("ARC Max Size (GB):"))
+        # Adjustment: min=0 (auto), max=sensible limit (e.g. 512GB or 1024GB), step=1GB
+        arc_adjustment = Gtk.Adjustment(value=values["arc_max_gb"], lower=0, upper=512, step_increment=1, page_increment=8, page_size=0)
+        self.arc_max_gb_spinbutton = Gtk.SpinButton(adjustment=arc_adjustment, climb_rate=1, digits=0)
+        attach_row(arc_label, self.arc_max_gb_spinbutton, "arc_max_gb")
 
-                    model = device.get("model", "N/A")
-                    size = device.get("size", "N/A")
-                    # Path is more reliable than name for ZFS.
-                    self.new_pool_disk_store.append([False, dev_path, model, size])
+        self.arc_warning_label = Gtk.Label()
+        self.arc_warning_label.set_markup("0 GB means auto (typically 50% of RAM). Check ZFS docs for details.")
+        attach_note(self.arc_warning_label)
 
-            if not len(self.new_pool_disk_store):
-                 self.warning_label.set_markup("<span foreground='orange'>No suitable disks found for new pool creation. Check connected drives.</span>")
+        # --- L2ARC Devices ---
+        l2arc_label = Gtk.Label(_tr("L2ARC Device(s):"))
+        self.l2arc_devices_entry = Gtk.Entry()
+        self.l2arc_devices_entry.set_placeholder_text("/dev/sdx /dev/sdy (optional, space-separated)")
+        self.l2arc_devices_entry.set_text(values["l2arc_devices"])
+        attach_row(l2arc_label, self.l2arc_devices_entry, "l2arc_devices")
 
+        self.l2arc_warning_label = Gtk.Label()
+        self.l2arc_warning_label.set_markup(
+            "<small>Enter space-separated full device paths (e.g., /dev/nvme0n1pSpecial /dev/disk/by-id/...). "
+            "Ensure these are fast SSDs not used for other purposes. Incorrect devices can degrade performance or cause data loss on L2ARC.</small>"
+        )
+        attach_note(self.l2arc_warning_label)
+
+        self._advanced_vbox.pack_start(grid, False, False, 0)
+
+        # Every advanced-settings widget feeds the same (debounced) handler; the widget
+        # name is its self._state key. _advanced_handlers: key -> (widget, handler id)
+        self._advanced_handlers = {}
+        for widget, signal, key in (
+            (self.ashift_combo, "changed", "ashift"),
+            (self.compression_algo_combo, "changed", "compression"),
+            (self.zstd_level_scale, "value-changed", "zstd_level"),
+            (self.recordsize_combo, "changed", "recordsize"),
+            (self.atime_combo, "changed", "atime"),
+            (self.xattr_combo, "changed", "xattr"),
+            (self.dnodesize_combo, "changed", "dnodesize"),
+            (self.arc_max_gb_spinbutton, "value-changed", "arc_max_gb"),
+            (self.l2arc_devices_entry, "changed", "l2arc_devices"),
+        ):
+            widget.set_name(key)
+            self._advanced_handlers[key] = (widget, widget.connect(signal, self.on_advanced_setting_changed))
+
+        self._advanced_built = True
+        self._advanced_vbox.show_all()
 
-        except FileNotFoundError:
-            libcalamares.utils.error("lsblk command not found. Cannot list disks.")
+        # Initially update visibility of zstd slider and helper texts
+        self._update_compression_ui_elements()
+        self._update_ashift_warning()
+        self._update_arc_warning() # Initial call for ARC warning
+
+    def _on_advanced_tooltip(self, widget, x, y, keyboard_mode, tooltip):
+        """Shared query-tooltip handler for the advanced setting labels, keyed by widget name."""
+        tooltip.set_text(_ADVANCED_TOOLTIPS[widget.get_name()])
+        return True
+
+    def _populate_available_disks(self, force=False):
+        """Populates the disk selection treeview with available disks.
+
+        The lsblk scan and pool-membership filtering run once per dialog; later calls
+        (e.g. toggling the pool mode) keep the already populated master store. Pass
+        force=True to rescan.
+        The disk list published in global storage (by zfspooldetect or an earlier scan)
+        is used while the set of disks in /sys/block still matches the one it was taken with.
+        Otherwise a scan from the last few seconds (_LSBLK_CACHE) is reused, and failing
+        that lsblk runs asynchronously through Gio.Subprocess so the dialog stays
+        responsive; a placeholder row is shown until _apply_disk_list fills the store.
+        A forced rescan supersedes one still in flight rather than waiting for it.
+        """
+        generation = libcalamares.globalstorage.value("available_disks_generation")
+        if self._cached_disks is not None and not force and generation == self._disks_generation:
+            return  # Master store already holds the cached rows
+        if self._lsblk_proc is not None and not force:
+            return  # A scan is already running; its callback will fill the store
+
+        if not force:
+            devices = libcalamares.globalstorage.value("available_disks")
+            # Reuse the published scan unless disks were added or removed since
+            devices_key = libcalamares.globalstorage.value("available_disks_key")
+            if devices is not None and devices_key == _block_devices_key():
+                self._disks_generation = generation
+                self._cached_disks = self._filter_candidate_disks(devices)
+                self._fill_disk_store()
+                return
+            devices = _LSBLK_CACHE.get()
+            if devices is not None:
+                self._cached_disks = self._filter_candidate_disks(devices)
+                self._fill_disk_store()
+                return
+
+        # Using path for device name as it's more reliable for ZFS. Name can be like 'sda'.
+        cmd = ["lsblk", "-dPno", "NAME,PATH,MODEL,SIZE,TYPE,TRAN", "--bytes", "--exclude", "7,1"]
+        libcalamares.utils.debug(f"Running command: {' '.join(cmd)}")
+        self._disk_scan_id += 1
+        try:
+            self._lsblk_proc = Gio.Subprocess.new(
+                cmd, Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_PIPE)
+        except GLib.Error as e:
+            libcalamares.utils.error(f"lsblk command not found. Cannot list disks: {e}")
             self.warning_label.set_markup("<span foreground='red'>Error: lsblk command not found. Disk listing unavailable.</span>")
-        except subprocess.CalledProcessError as e:
-            libcalamares.utils.error(f"lsblk command failed: {e.stderr}")
-            self.warning_label.set_markup(f"<span foreground='red'>Error running lsblk: {e.stderr}. Disk listing unavailable.</span>")
-        except json.JSONDecodeError as e:
-            libcalamares.utils.error(f"Failed to parse lsblk JSON output: {e}")
-            self.warning_label.set_markup("<span foreground='red'>Error parsing disk information. Disk listing unavailable.</span>")
-        except Exception as e:
+            return
+
+        self._show_disk_placeholder()
+        self._lsblk_proc.communicate_utf8_async(None, None, self._on_lsblk_done, self._disk_scan_id)
+
+    def _show_disk_placeholder(self):
+        """Replace the disk rows with a single 'Scanning disks…' row.
+
+        The ticked disks are kept; _fill_disk_store drops any the rescan no longer finds.
+        """
+        self._all_disk_paths = []
+        self._disk_iters = []
+        self._master_disk_store.clear()
+        self._master_disk_store.insert_with_valuesv(-1, _STORE_COLUMNS, [False, "Scanning disks…", "", ""])
+
+    def _do_populate(self):
+        self._populate_pending = 0
+        self._populate_available_disks()
+        return False  # One-shot idle source
+
+    def _on_lsblk_done(self, proc, result, scan_id):
+        """Gio callback: hand the finished lsblk output to a worker thread for parsing."""
+        if scan_id != self._disk_scan_id:
+            return  # Superseded by a newer scan
+        try:
+            _ok, stdout, stderr = proc.communicate_utf8_finish(result)
+        except GLib.Error as e:
+            self._lsblk_proc = None
             libcalamares.utils.error(f"An unexpected error occurred while populating disks: {e}")
+            self._master_disk_store.clear()
+            self._selected_disks.clear()
             self.warning_label.set_markup("<span foreground='red'>An unexpected error occurred. Disk listing unavailable.</span>")
+            self._schedule_validate()
+            return
+        if not proc.get_successful():
+            self._lsblk_proc = None
+            libcalamares.utils.error(f"lsblk command failed: {stderr}")
+            self._master_disk_store.clear()
+            self._selected_disks.clear()
+            self.warning_label.set_markup(f"<span foreground='red'>Error running lsblk: {stderr}. Disk listing unavailable.</span>")
+            self._schedule_validate()
+            return
+        # Parsing and the pool-membership stat() calls stay off the GTK thread;
+        # _lsblk_proc remains set until _apply_disk_list so no second scan starts meanwhile
+        threading.Thread(target=self._scan_disks_worker, args=(scan_id, stdout),
+                         name="zfs-disk-scan", daemon=True).start()
 
+    def _scan_disks_worker(self, scan_id, stdout):
+        """Worker thread: parse lsblk output and filter it; results go back via idle_add.
+
+        Only plain Python work happens here. Widgets and global storage are touched
+        from _apply_disk_list on the main loop.
+        """
+        try:
+            devices = [dict(_LSBLK_RE.findall(line)) for line in stdout.splitlines()]
+            disks = self._filter_candidate_disks(devices)
+        except Exception as e:
+            GLib.idle_add(self._apply_disk_list, scan_id, None, e)
+            return
+        GLib.idle_add(self._apply_disk_list, scan_id, devices, disks)
+
+    def _apply_disk_list(self, scan_id, devices, disks):
+        """Idle callback: publish a finished scan and populate the disk store.
+
+        devices is None when the worker failed; disks then holds the exception.
+        """
+        if scan_id != self._disk_scan_id:
+            return False  # A newer scan was started meanwhile; its result wins
+        self._lsblk_proc = None
+        if devices is None:
+            libcalamares.utils.error(f"An unexpected error occurred while populating disks: {disks}")
+            self._master_disk_store.clear()
+            # No disk list left to select from, so nothing ticked may reach zpool create
+            self._selected_disks.clear()
+            self.warning_label.set_markup("<span foreground='red'>An unexpected error occurred. Disk listing unavailable.</span>")
+            self._schedule_validate()
+            return False
+        _LSBLK_CACHE.put(devices)
+        if _DEBUG:
+            libcalamares.utils.debug(f"lsblk output: {devices}")
+        # Publish the fresh scan and bump the generation so other readers see it
+        self._disks_generation = (libcalamares.globalstorage.value("available_disks_generation") or 0) + 1
+        libcalamares.globalstorage.insert("available_disks", devices)
+        libcalamares.globalstorage.insert("available_disks_key", _block_devices_key())
+        libcalamares.globalstorage.insert("available_disks_generation", self._disks_generation)
+        self._cached_disks = disks
+        self._fill_disk_store()
+        self._schedule_validate()
+        return False  # One-shot idle source
+
+    def _filter_candidate_disks(self, devices):
+        """Reduce parsed lsblk rows to (path, model, size) tuples usable for a new pool."""
+        pool_disks = self._pool_disk_set()
+        # Checked once per scan rather than per row
+        live_medium = os.path.exists("/live/medium") # Example common live media path
+        # Path is more reliable than name for ZFS. Interned so rescans reuse the same
+        # objects that key self._selected_disks.
+        whole_disks = ((sys.intern(device.get("PATH") or f"/dev/{device.get('NAME')}"), device)
+                       for device in devices if device.get("TYPE") == "disk")
+        return [(dev_path, device.get("MODEL") or "N/A", _display_size(device.get("SIZE", "")))
+                for dev_path, device in whole_disks
+                if self._is_candidate_disk(dev_path, pool_disks, live_medium)]
+
+    def _is_candidate_disk(self, dev_path, pool_disks, live_medium):
+        """False for the live medium and for disks that belong to an imported pool."""
+        # Basic check to exclude root disk of live system (very simplistic)
+        # A more robust check would involve checking mount points from Calamares's system information.
+        if live_medium and dev_path == "/dev/sda":
+            libcalamares.utils.debug(f"Skipping likely live media disk: {dev_path}")
+            return False
+
+        # Exclude disks already part of an imported ZFS pool (no stat when there are none)
+        if pool_disks:
+            try:
+                rdev = os.stat(dev_path).st_rdev
+            except OSError:
+                rdev = None
+            if rdev in pool_disks:
+                libcalamares.utils.debug(f"Skipping disk {dev_path} already in an imported ZFS pool.")
+                return False
+        return True
+
+    def _pool_disk_set(self):
+        """Device numbers of disks in imported pools; pool_info doesn't change, so built once."""
+        if self._cached_pool_disk_set is not None:
+            return self._cached_pool_disk_set
+        # This is a simplified check. A more robust check would involve parsing `zpool status -vLP`
+        # or checking mount points more thoroughly.
+        disks_in_existing_pools = set()
+        if self.pool_info:
+             for pool_name, p_info in self.pool_info.items():
+                for vdev in p_info.get('vdevs', []): # Assuming zfspooledetect provides vdev info
+                    # This is highly dependent on zfspooledetect output structure
+                    vdev_path = vdev.get('path') or (vdev.get('name') and f"/dev/{vdev['name']}")
+                    if not vdev_path:
+                        continue
+                    try:
+                        # Device number identifies the node no matter which /dev/disk/by-* symlink names it
+                        disks_in_existing_pools.add(os.stat(vdev_path).st_rdev)
+                    except OSError:
+                        pass
+        self._cached_pool_disk_set = frozenset(disks_in_existing_pools)
+
+        if _DEBUG:
+            libcalamares.utils.debug(f"Disks in existing ZFS pools: {self._cached_pool_disk_set}")
+        return self._cached_pool_disk_set
+
+    def _fill_disk_store(self):
+        """Load the cached disk list into the new-pool disk store."""
+        # Detach the model during the bulk load so the view doesn't react per row
+        self.disk_selection_treeview.set_model(None)
+        self._master_disk_store.freeze_notify()
+        self._master_disk_store.clear()
+        self._all_disk_paths = []
+        self._disk_iters = []
+        for dev_path, model, size in self._cached_disks:
+            # ListStore iters stay valid until their row is removed
+            self._disk_iters.append(self._master_disk_store.insert_with_valuesv(
+                -1, _STORE_COLUMNS, [dev_path in self._selected_disks, dev_path, model, size]))
+            self._all_disk_paths.append(dev_path)
+        # Keep ticks on disks that are still present, in the order they were ticked
+        present = set(self._all_disk_paths)
+        for dev_path in [p for p in self._selected_disks if p not in present]:
+            del self._selected_disks[dev_path]
+        self._master_disk_store.thaw_notify()
+        self.disk_selection_treeview.set_model(self._disk_filter)
+
+        if not len(self._master_disk_store):
+             self.warning_label.set_markup("<span foreground='orange'>No suitable disks found for new pool creation. Check connected drives.</span>")
+
+
+    def _disk_visible(self, model, iter_, data):
+        """TreeModelFilter visibility func for the disk view."""
+        return self._show_disks
 
     def on_disk_selection_toggled(self, renderer, path_str): # path is string here
         """Handle disk selection toggle in the new pool disk tree."""
-        iter_ = self.new_pool_disk_store.get_iter_from_string(path_str)
-        if iter_:
-            current_state = self.new_pool_disk_store.get_value(iter_, 0)
-            self.new_pool_disk_store.set_value(iter_, 0, not current_state)
-            self.validate_selection()
-            self._update_summary_panel()
+        # The view shows the filter model; map its path back onto the master store
+        child_path = self._disk_filter.convert_path_to_child_path(Gtk.TreePath.new_from_string(path_str))
+        row = child_path.get_indices()[0]
+        if row >= len(self._all_disk_paths):
+            return  # "Scanning disks…" placeholder row
+        # The selected set mirrors the toggle column, so only the write crosses into GTK
+        dev_path = self._all_disk_paths[row]
+        new_state = dev_path not in self._selected_disks
+        self._master_disk_store.set_value(self._disk_iters[row], 0, new_state)
+        if new_state:
+            self._selected_disks[dev_path] = None
+        else:
+            self._selected_disks.pop(dev_path, None)
+        self._schedule_validate()
 
     def on_new_pool_config_changed(self, widget):
         """Handle changes in new pool RAID type or name."""
-        self.validate_selection()
-        self._update_summary_panel()
+        # These widgets only feed the new-pool checks; nothing to redo in existing-pool mode
+        if self.mode_create_new_pool_radio.get_active():
+            self._schedule_validate()
 
     def on_pool_mode_changed(self, widget):
         """Handle toggling between using existing pool and creating a new one."""
         if not widget.get_active():
             return
 
+        self._show_disks = self.mode_create_new_pool_radio.get_active()
+        self._disk_filter.refilter()
+
         if self.mode_create_new_pool_radio.get_active():
             libcalamares.utils.debug("Switched to Create New Pool mode.")
-            self._populate_available_disks() # Populate disks when switching to this mode
+            # Scans on first switch only; the filter handles later ones. The scan is
+            # started from an idle callback so the mode switch is drawn first.
+            if self._cached_disks is None and self._lsblk_proc is None and not self._populate_pending:
+                self._show_disk_placeholder()
+                self._populate_pending = GLib.idle_add(self._do_populate, priority=GLib.PRIORITY_DEFAULT_IDLE)
             self.new_pool_vbox.show()
             if self.pool_frame: self.pool_frame.hide()
             if self.mode_frame: self.mode_frame.hide()
@@ -694,127 +1326,140 @@ class ZFSTargetSelector:
             if self.mode_frame: self.mode_frame.show()
             self.workload_frame.set_label("Workload Profile & ZFS Properties (for selected pool/dataset)")
 
-        self.validate_selection()
-        self._update_summary_panel()
+        self._schedule_validate()
 
 
     def on_reset_to_defaults_clicked(self, widget):
         """Resets all ZFS configuration options to 'General Desktop' profile defaults."""
         libcalamares.utils.debug("Reset to Recommended Defaults clicked.")
-        try:
-            general_desktop_idx = self.workload_profiles.index("General Desktop")
-            self.workload_combo.set_active(general_desktop_idx)
-        except ValueError:
-            libcalamares.utils.warning("Could not find 'General Desktop' profile to reset.")
-            # Fallback: set active to 0 if profile list changed, or do nothing
-            if len(self.workload_profiles) > 0:
-                 self.workload_combo.set_active(0)
+        self.workload_combo.set_active(self._profile_index["General Desktop"])
 
         # The on_workload_profile_changed handler will take care of resetting
         # individual settings and updating the UI, including the summary panel.
-        # self._update_summary_panel() # on_workload_profile_changed calls validate_selection, which should call summary
-
-    def _update_summary_panel(self):
-        """Updates the configuration summary panel."""
-        summary_lines = []
-        warnings = []
-
-        # Profile
-        profile = self.workload_combo.get_active_text()
-        summary_lines.append(f"<b>Workload Profile:</b> {profile}")
-
-        if self.mode_create_new_pool_radio.get_active():
-            summary_lines.append("<b>Pool Creation Mode:</b> Create New Pool")
-            new_pool_name = self.new_pool_name_entry.get_text()
-            raid_type = self.new_pool_raid_type_combo.get_active_text()
-            selected_disks = []
-            disk_count = 0
-            for row in self.new_pool_disk_store:
-                if row[0]: # if selected
-                    selected_disks.append(row[1]) # device path
-                    disk_count +=1
-
-            summary_lines.append(f"  <b>New Pool Name:</b> {new_pool_name if new_pool_name else '<i>Not set</i>'}")
-            summary_lines.append(f"  <b>RAID Type:</b> {raid_type} ({disk_count} disk(s) selected)")
-            if selected_disks:
-                # Only list first few disks if many are selected, for brevity
-                display_disks = selected_disks[:3] + ["..."] if len(selected_disks) > 3 else selected_disks
-                summary_lines.append(f"  <b>Selected Disks:</b> {', '.join(display_disks)}")
-            else: # This case should be caught by validate_selection, but good for summary too
-                summary_lines.append("  <b>Selected Disks:</b> <i>None</i>")
-                # warnings.append("<span foreground='red'>Error: No disks selected for new pool.</span>") # Already in validate_selection
-
-            # RAID validation messages for summary (can mirror validate_selection or be simpler)
-            min_disks_map = {"mirror": 2, "raidz1": 2, "raidz2": 3, "raidz3": 4} # Practical minimums for summary
-            if raid_type != "stripe" and disk_count < min_disks_map.get(raid_type, 999):
-                 warnings.append(f"<span foreground='orange'>Warning: {raid_type.upper()} typically needs at least {min_disks_map.get(raid_type)} disks.</span>")
-
-
-        else: # Using existing pool
-            summary_lines.append("<b>Pool Creation Mode:</b> Use Existing Pool")
-            # Add details about selected existing pool if available
-            selection = self.pool_tree.get_selection()
-            model, treeiter = selection.get_selected()
-            if treeiter:
-                pool_name = model[treeiter][0]
-                summary_lines.append(f"  <b>Selected Existing Pool:</b> {pool_name}")
-            else:
-                summary_lines.append("  <b>Selected Existing Pool:</b> <i>None selected</i>")
-
+        # self._update_summary_panel() # on_workload_profile_changed schedules _rebuild_ui_state, which refreshes the summary
+
+    def _update_summary_panel(self, creating_new_pool, pool_name):
+        """Updates the configuration summary panel.
+
+        Called from _rebuild_ui_state with the mode and pool name it already read.
+        Each section is memoized on the values it renders and has its own label,
+        so a keystroke only re-formats and re-parses the section whose inputs changed.
+        When no input changed at all (e.g. a focus change re-emitting "changed" with
+        the same text) the whole refresh is skipped.
+        """
+        profile = _WORKLOAD_PROFILES[self.workload_combo.get_active()]
+
+        if creating_new_pool:
+            mode_key = (True, pool_name,
+                        _RAID_TYPES[self.new_pool_raid_type_combo.get_active()], tuple(self._selected_disks))
+        else:
+            mode_key = (False, pool_name)
 
         # Advanced Settings (apply to new or existing, based on context)
         # Show if expander is open, or if profile is custom, or if creating new pool (always relevant for new pool)
-        if self.advanced_expander.get_expanded() or profile != "General Desktop" or self.mode_create_new_pool_radio.get_active():
-            summary_lines.append("<u>ZFS Properties:</u>") # Changed heading for clarity
-
-            # ashift (Applies to new pool creation)
-            ashift_val = self.ashift_combo.get_active_text()
-            summary_lines.append(f"  <b>ashift:</b> {ashift_val}")
-            if ashift_val != "Auto-detect":
-                warnings.append("<i>Reminder: Manual ashift is permanent. Ensure it matches hardware.</i>")
-
-            # Compression
-            comp_algo = self.compression_algo_combo.get_active_text()
-            comp_text = f"  <b>Compression:</b> {comp_algo}"
-            if comp_algo == "zstd":
-                zstd_level = self.zstd_level_scale.get_value_as_int()
-                comp_text += f" (Level: {zstd_level})"
-                if zstd_level > 10:
-                    warnings.append(f"<span foreground='orange'>Warning: High Zstd level ({zstd_level}) has significant CPU cost.</span>")
-            summary_lines.append(comp_text)
-
-            # Core Properties (Applies to datasets on new or existing pool)
-            summary_lines.append(f"    <b>Record Size:</b> {self.recordsize_combo.get_active_text()}")
-            summary_lines.append(f"    <b>atime:</b> {self.atime_combo.get_active_text()}")
-            summary_lines.append(f"    <b>xattr:</b> {self.xattr_combo.get_active_text()}")
-            summary_lines.append(f"    <b>dnodesize:</b> {self.dnodesize_combo.get_active_text()}")
-
-            # ARC (Applies to new pool, or system-wide if existing)
-            arc_gb = self.arc_max_gb_spinbutton.get_value_as_int()
-            arc_text = "Auto (default)" if arc_gb == 0 else f"{arc_gb} GB"
-            summary_lines.append(f"    <b>ARC Max Size:</b> {arc_text}")
-            if arc_gb > 0 and arc_gb < 4 :
-                 warnings.append("<span foreground='orange'>Warning: ARC size less than 4GB might be too restrictive.</span>")
-
-            # L2ARC (Applies to new pool)
-            if self.mode_create_new_pool_radio.get_active():
-                l2arc_devs = self.l2arc_devices_entry.get_text().strip()
-                l2arc_text = "Not configured" if not l2arc_devs else l2arc_devs
-                summary_lines.append(f"    <b>L2ARC Devices:</b> {l2arc_text}")
-                if l2arc_devs:
-                    if not all(dev.startswith("/dev/") for dev in l2arc_devs.split()):
-                         warnings.append("<span foreground='red'>Error: L2ARC device paths seem invalid.</span>")
-
-        # Combine summary and warnings
-        full_summary_text = "\n".join(summary_lines)
-        if warnings:
-            full_summary_text += "\n\n<b>Notices & Warnings:</b>\n" + "\n".join(warnings)
-
-        self.summary_label.set_markup(f"<small>{full_summary_text}</small>")
+        if self.advanced_expander.get_expanded() or profile != "General Desktop" or creating_new_pool:
+            advanced = self._state
+            properties_key = (creating_new_pool,) + tuple(advanced[k] for k in _ADVANCED_KEYS[:-1]) + (
+                advanced["l2arc_devices"].strip(),)
+        else:
+            properties_key = None
 
+        summary_key = (profile, mode_key, properties_key)
+        if summary_key == self._last_summary_key:
+            return
+        self._last_summary_key = summary_key
+
+        self._summary_section("workload", (profile,), self._section_workload)
+        self._summary_section("mode", mode_key, self._section_mode)
+        self._summary_section("properties", properties_key, self._section_properties)
+
+        # Warnings are collected from all sections into their own label
+        warnings = [warning for name in _SUMMARY_SECTIONS for warning in self._summary_cache[name][2]]
+        warnings_text = "\n<b>Notices & Warnings:</b>\n" + "\n".join(warnings) if warnings else ""
+        if warnings_text != self._summary_warnings_text:
+            self._summary_warnings_text = warnings_text
+            self._set_summary_label("warnings", warnings_text)
+
+    def _set_summary_label(self, name, text):
+        """Show `text` in section label `name`, hiding the label when the section is empty."""
+        label = self._summary_labels[name]
+        label.set_markup(text)
+        label.set_visible(bool(text))
+
+    def _summary_section(self, name, key, build):
+        """Rebuild summary section `name` only if its input key changed since the last refresh."""
+        cached = self._summary_cache.get(name)
+        if cached is None or cached[0] != key:
+            self._summary_cache[name] = (key, *build(key))
+            # Only the rebuilt section's label re-parses its markup
+            self._set_summary_label(name, self._summary_cache[name][1])
+
+    def _section_workload(self, key):
+        profile, = key
+        return f"<b>Workload Profile:</b> {profile}", []
+
+    def _section_mode(self, key):
+        if not key[0]: # Using existing pool
+            _creating, pool_name = key
+            return ("<b>Pool Creation Mode:</b> Use Existing Pool\n"
+                    f"  <b>Selected Existing Pool:</b> {pool_name or '<i>None selected</i>'}"), []
+
+        _creating, new_pool_name, raid_type, selected_disks = key
+        disk_count = len(selected_disks)
+        # Only list first few disks if many are selected, for brevity. No disks should be
+        # caught by _validate_new_pool, but is shown here too.
+        if disk_count > 3:
+            disks_text = ", ".join(selected_disks[:3]) + ", ..."
+        else:
+            disks_text = ", ".join(selected_disks) or "<i>None</i>"
+        text = ("<b>Pool Creation Mode:</b> Create New Pool\n"
+                f"  <b>New Pool Name:</b> {new_pool_name or '<i>Not set</i>'}\n"
+                f"  <b>RAID Type:</b> {raid_type} ({disk_count} disk(s) selected)\n"
+                f"  <b>Selected Disks:</b> {disks_text}")
+
+        # RAID validation messages for summary (can mirror _validate_new_pool or be simpler)
+        min_disks = _MIN_DISKS_SUMMARY.get(raid_type, 0)  # stripe has no minimum here
+        warnings = [
+            f"<span foreground='orange'>Warning: {raid_type.upper()} typically needs at least {min_disks} disks.</span>"
+        ] if disk_count < min_disks else []
+        return text, warnings
+
+    def _section_properties(self, key):
+        if key is None: # Section hidden
+            return "", []
+        (creating_new_pool, ashift_val, comp_algo, zstd_level, record_size,
+         atime, xattr, dnodesize, arc_gb, l2arc_devs) = key
+
+        # ashift applies to new pool creation; record size, atime, xattr and dnodesize to the
+        # datasets on new or existing pools; ARC to the new pool, or system-wide if existing;
+        # L2ARC only to a new pool.
+        zstd_text = f" (Level: {zstd_level})" if comp_algo == "zstd" else ""
+        arc_text = "Auto (default)" if arc_gb == 0 else f"{arc_gb} GB"
+        l2arc_line = f"\n    <b>L2ARC Devices:</b> {l2arc_devs or 'Not configured'}" if creating_new_pool else ""
+        text = ("<u>ZFS Properties:</u>\n"
+                f"  <b>ashift:</b> {ashift_val}\n"
+                f"  <b>Compression:</b> {comp_algo}{zstd_text}\n"
+                f"    <b>Record Size:</b> {record_size}\n"
+                f"    <b>atime:</b> {atime}\n"
+                f"    <b>xattr:</b> {xattr}\n"
+                f"    <b>dnodesize:</b> {dnodesize}\n"
+                f"    <b>ARC Max Size:</b> {arc_text}"
+                f"{l2arc_line}")
+
+        warnings = [warning for condition, warning in (
+            (ashift_val != "Auto-detect",
+             "<i>Reminder: Manual ashift is permanent. Ensure it matches hardware.</i>"),
+            (comp_algo == "zstd" and zstd_level > 10,
+             f"<span foreground='orange'>Warning: High Zstd level ({zstd_level}) has significant CPU cost.</span>"),
+            (0 < arc_gb < 4,
+             "<span foreground='orange'>Warning: ARC size less than 4GB might be too restrictive.</span>"),
+            (creating_new_pool and l2arc_devs and not _l2arc_devices_valid(l2arc_devs),
+             "<span foreground='red'>Error: L2ARC device paths seem invalid.</span>"),
+        ) if condition]
+        return text, warnings
 
     def _update_ashift_warning(self):
-        if self.ashift_combo.get_active_text() != "Auto-detect":
+        if self._state["ashift"] != "Auto-detect":
             self.ashift_warning_label.set_markup(
                 "<span foreground='orange'><b>Warning:</b> Setting ashift manually is an advanced operation. "
                 "Incorrect values (e.g., ashift=9 for 4Kn drives) can severely degrade performance "
@@ -825,11 +1470,12 @@ class ZFSTargetSelector:
             self.ashift_warning_label.set_markup("")
 
     def _update_compression_ui_elements(self):
-        selected_compression = self.compression_algo_combo.get_active_text()
-        self.zstd_level_hbox.set_visible(selected_compression == "zstd")
+        selected_compression = self._state["compression"]
+        for widget in self._zstd_level_row:
+            widget.set_visible(selected_compression == "zstd")
 
         if selected_compression == "zstd":
-            level = int(self.zstd_level_scale.get_value())
+            level = self._state["zstd_level"]
             if level <= 3:
                 helper_text = "<b>Zstd Level {}:</b> Good balance of speed and compression. Recommended for general use.".format(level)
             elif level <= 9:
@@ -856,7 +1502,7 @@ class ZFSTargetSelector:
             self.compression_helper_label.set_markup("")
 
     def _update_arc_warning(self):
-        arc_val = self.arc_max_gb_spinbutton.get_value_as_int()
+        arc_val = self._state["arc_max_gb"]
         if arc_val == 0:
             self.arc_warning_label.set_markup(
                 "<small><b>Auto Mode (0 GB):</b> ZFS will typically use 50% of system RAM for ARC. This is often optimal. "
@@ -876,94 +1522,61 @@ class ZFSTargetSelector:
             )
 
     def on_advanced_setting_changed(self, widget):
-        """Handle changes in any advanced setting widget."""
+        """Handle changes in any advanced setting widget.
+
+        Slider drags and typing fire this many times a second, so the actual work is
+        coalesced into one _flush_advanced_update per 50 ms. Only the state mirror is
+        updated here.
+        """
+        if isinstance(widget, Gtk.ComboBox):
+            value = _COMBO_OPTIONS[widget.get_name()][widget.get_active()]
+        elif isinstance(widget, (Gtk.SpinButton, Gtk.Scale)):
+            value = int(widget.get_value())
+        else:
+            value = widget.get_text()
+        self._state[widget.get_name()] = value
+        if not self._advanced_pending:
+            self._advanced_pending = GLib.timeout_add(50, self._flush_advanced_update)
+
+    def _flush_advanced_update(self):
+        self._advanced_pending = 0
         self._update_ashift_warning()
         self._update_compression_ui_elements()
         self._update_arc_warning()
         # L2ARC warning is static for now, could add validation if entry has text.
-        self._update_summary_panel() # Update summary on any advanced change
 
         # If any advanced setting is changed, switch profile to "Custom"
-        if self.workload_combo.get_active_text() != "Custom":
-            custom_idx = -1
-            for i, profile_name in enumerate(self.workload_profiles):
-                if profile_name == "Custom":
-                    custom_idx = i
-                    break
-            if custom_idx != -1:
-                # Temporarily disconnect handler to prevent recursion if set_active triggers it
-                self.workload_combo.disconnect_by_func(self.on_workload_profile_changed)
-                self.workload_combo.set_active(custom_idx)
-                self.workload_combo.connect("changed", self.on_workload_profile_changed)
-                # Ensure expander is open if a setting is changed.
-                if not self.advanced_expander.get_expanded(): # Check before forcing
-                    self.advanced_expander.set_expanded(True) # This might re-trigger if not careful
-
-        self.validate_selection()
-
+        if self.workload_combo.get_active() != self._custom_idx:
+            # Block the profile handler so switching to Custom doesn't re-apply anything
+            self.workload_combo.handler_block(self._workload_handler)
+            self.workload_combo.set_active(self._custom_idx)
+            self.workload_combo.handler_unblock(self._workload_handler)
+            # Ensure expander is open if a setting is changed.
+            if not self.advanced_expander.get_expanded(): # Check before forcing
+                self.advanced_expander.set_expanded(True) # This might re-trigger if not careful
+
+        self._schedule_validate() # Also refreshes the summary panel
+        return False  # One-shot timeout source
 
     def on_workload_profile_changed(self, combo):
         """Handle workload profile selection change."""
-        selected_profile = combo.get_active_text()
+        selected_profile = _WORKLOAD_PROFILES[combo.get_active()]
         libcalamares.utils.debug(f"Workload profile changed to: {selected_profile}")
 
-        is_custom = (selected_profile == "Custom")
-
-        # Temporarily disconnect advanced_setting_changed from all controls
-        # to prevent "Custom" profile from being re-selected due to programmatic changes.
-        # This is a bit verbose, ideally group these controls or have a flag.
-        all_advanced_controls = [
-            self.ashift_combo, self.compression_algo_combo, self.zstd_level_scale,
-            self.recordsize_combo, self.atime_combo, self.xattr_combo, self.dnodesize_combo,
-            self.arc_max_gb_spinbutton, self.l2arc_devices_entry
-        ]
-        for control in all_advanced_controls:
-            if hasattr(control, 'handler_is_connected') and control.handler_is_connected(self.on_advanced_setting_changed_handler_id):
-                 control.disconnect(self.on_advanced_setting_changed_handler_id)
-            elif hasattr(control, '_signal_id_advanced_setting'): # Custom attribute to store handler ID
-                 if control.handler_is_connected(control._signal_id_advanced_setting):
-                    control.disconnect(control._signal_id_advanced_setting)
-
+        is_custom = (combo.get_active() == self._custom_idx)
 
         if not is_custom:
             self.advanced_expander.set_expanded(False)
             # Apply predefined settings
-            if selected_profile == "General Desktop":
-                self.ashift_combo.set_active(self.ashift_options.index("Auto-detect"))
-                self.compression_algo_combo.set_active(self.compression_options.index("lz4"))
-                self.zstd_level_scale.set_value(3)
-                self.recordsize_combo.set_active(self.recordsize_options.index("Default (128K)"))
-                self.atime_combo.set_active(self.atime_options.index("relatime"))
-                self.xattr_combo.set_active(self.xattr_options.index("sa"))
-                self.dnodesize_combo.set_active(self.dnodesize_options.index("auto"))
-                self.arc_max_gb_spinbutton.set_value(0) # Auto
-                self.l2arc_devices_entry.set_text("")
-            elif selected_profile == "Virtual Machine Host":
-                self.ashift_combo.set_active(self.ashift_options.index("Auto-detect"))
-                self.compression_algo_combo.set_active(self.compression_options.index("lz4"))
-                self.zstd_level_scale.set_value(3)
-                self.recordsize_combo.set_active(self.recordsize_options.index("64K"))
-                self.atime_combo.set_active(self.atime_options.index("off"))
-                self.xattr_combo.set_active(self.xattr_options.index("sa"))
-                self.dnodesize_combo.set_active(self.dnodesize_options.index("auto"))
-                self.arc_max_gb_spinbutton.set_value(0) # Auto, or a sensible portion like 8GB-16GB if RAM is known
-                self.l2arc_devices_entry.set_text("") # L2ARC for VMs can be very beneficial
-            elif selected_profile == "Bulk File Storage/NAS":
-                self.ashift_combo.set_active(self.ashift_options.index("Auto-detect"))
-                self.compression_algo_combo.set_active(self.compression_options.index("zstd"))
-                self.zstd_level_scale.set_value(6)
-                self.recordsize_combo.set_active(self.recordsize_options.index("1M"))
-                self.atime_combo.set_active(self.atime_options.index("off"))
-                self.xattr_combo.set_active(self.xattr_options.index("sa"))
-                self.dnodesize_combo.set_active(self.dnodesize_options.index("auto"))
-                self.arc_max_gb_spinbutton.set_value(0) # Auto, or a larger portion if RAM is plentiful
-                self.l2arc_devices_entry.set_text("")
+            preset = _PROFILE_PRESETS.get(selected_profile)
+            if preset:
+                self._apply_advanced_values(preset)
         else: # Custom profile selected
-            self.advanced_expander.set_expanded(True)
+            self.advanced_expander.set_expanded(True) # Builds the advanced widgets on first use
             # On "Custom", we don't change settings, user has full control.
             # Ensure all controls within expander are sensitive
             # Make sure all controls within expander are sensitive
-            for child_widget in self.advanced_expander.get_child().get_children():
+            for child_widget in self._advanced_vbox.get_children():
                  # This includes HBoxes and the Grid. For finer control:
                  # Iterate through actual input widgets (combos, scale)
                 if hasattr(child_widget, 'set_sensitive'): # Check if it's a Gtk.Widget
@@ -979,41 +1592,65 @@ class ZFSTargetSelector:
                              sub_child.set_sensitive(True)
 
 
-        self._update_ashift_warning()
-        self._update_compression_ui_elements()
-        self._update_arc_warning() # Ensure ARC warning is also updated with profile changes
-        self._update_summary_panel() # Update summary when profile changes
-        self.validate_selection()
+        if self._advanced_built:
+            self._update_ashift_warning()
+            self._update_compression_ui_elements()
+            self._update_arc_warning() # Ensure ARC warning is also updated with profile changes
+        self._schedule_validate()
+
+    def _apply_advanced_values(self, values):
+        """Apply a profile preset to self._state and, once they exist, the widgets.
+
+        self._state mirrors the widgets, so only settings whose value differs are
+        written; an unchanged widget gets no set_* call and emits no "changed".
+        """
+        changed = [key for key in _ADVANCED_KEYS if self._state[key] != values[key]]
+        self._state.update(values)
+        if not self._advanced_built or not changed:
+            return
+        # Block on_advanced_setting_changed while the preset is written, so these
+        # programmatic changes don't switch the profile back to "Custom"
+        for key in changed:
+            widget, handler_id = self._advanced_handlers[key]
+            widget.handler_block(handler_id)
+            if key in _COMBO_INDEX:
+                widget.set_active(_COMBO_INDEX[key][values[key]])
+            elif key == "l2arc_devices":
+                widget.set_text(values[key])
+            else: # zstd_level scale, arc_max_gb spin button
+                widget.set_value(values[key])
+            widget.handler_unblock(handler_id)
 
     def on_advanced_expander_toggled(self, expander, param):
         """Handle expander state change."""
         is_expanded = expander.get_expanded()
         libcalamares.utils.debug(f"Advanced settings expander {'expanded' if is_expanded else 'collapsed'}.")
+        if is_expanded and not self._advanced_built:
+            self._build_advanced_widgets()
 
-        current_profile = self.workload_combo.get_active_text()
-        if is_expanded and current_profile != "Custom":
+        is_custom = self.workload_combo.get_active() == self._custom_idx
+        if is_expanded and not is_custom:
             # User manually expanded, switch to Custom profile
-            custom_idx = -1
-            for i, profile_name in enumerate(self.workload_profiles):
-                if profile_name == "Custom":
-                    custom_idx = i
-                    break
-            if custom_idx != -1:
-                self.workload_combo.set_active(custom_idx) # This will trigger on_workload_profile_changed
-        elif not is_expanded and current_profile == "Custom":
+            self.workload_combo.set_active(self._custom_idx) # This will trigger on_workload_profile_changed
+        elif not is_expanded and is_custom:
             # User collapsed while on Custom. This is fine, settings are preserved.
             # Or, one could argue to switch to a default profile, but that might be annoying.
             pass
 
-        self._update_summary_panel() # Update summary when expander state changes
-        self.validate_selection() # Re-validate if needed
+        self._schedule_validate()
+
 
+    def _pool_visible(self, model, iter_, data):
+        """Visible-func for the pool filter; reads health from the column lists, not the store"""
+        return self._pool_soa["health"][model.get_path(iter_).get_indices()[0]] != "FAULTED"
 
     def on_pool_selected(self, selection):
         """Handle pool selection"""
         model, treeiter = selection.get_selected()
-        if treeiter:
-            self.validate_selection()
+        self._selected_pool_name = model[treeiter][0] if treeiter else None
+        # The pool list only feeds the existing-pool checks
+        if treeiter and not self.mode_create_new_pool_radio.get_active():
+            self._schedule_validate()
 
     def on_mode_changed(self, widget):
         """Handle mode change"""
@@ -1026,8 +1663,7 @@ class ZFSTargetSelector:
         elif self.mode_alongside.get_active():
             self.dataset_entry.set_text("ROOT/proxmox-new")
 
-        self.validate_selection()
-        self._update_summary_panel() # Update summary if pool selection changes things (e.g. existing datasets) - TBD
+        self._schedule_validate()
 
     def on_encryption_toggled(self, widget):
         """Handle encryption toggle"""
@@ -1044,323 +1680,313 @@ class ZFSTargetSelector:
             self.confirm_entry.set_text("")
             self.encryption_status.set_markup("")
 
-        self.validate_selection()
-        self._update_summary_panel() # Encryption status might be part of summary
-
-    def validate_selection(self, widget=None):
-        """Validate current selection and update UI"""
-        # This function needs to be mode-aware.
-        self._update_summary_panel() # Keep summary fresh with validation changes.
+        self._schedule_validate()
+
+    def _schedule_validate(self, *args):
+        """Queue a single _rebuild_ui_state pass for the next idle turn of the main loop.
+
+        Signal handlers call this instead of validating directly, so a burst of
+        'changed' signals (typing, slider drags) collapses into one revalidation.
+        """
+        if not self._validate_pending:
+            self._validate_pending = GLib.idle_add(self._do_validate)
+
+    def _on_entry_changed(self, entry):
+        """Restart the 200 ms validation timer on every keystroke in a name entry.
+
+        Unlike the idle pass of _schedule_validate this waits for typing to pause,
+        so a typing burst is validated once instead of once per key.
+        """
+        if self._validate_pending:
+            GLib.source_remove(self._validate_pending)
+        self._validate_pending = GLib.timeout_add(200, self._do_validate)
+
+    def _do_validate(self):
+        self._validate_pending = 0
+        self._rebuild_ui_state()
+        return False  # One-shot idle/timeout source
+
+    def _rebuild_ui_state(self):
+        """Refresh summary, warning, encryption status and Next sensitivity in one pass.
+
+        The mode radio, selected pool and entry texts are read once here and shared
+        by the summary panel and the validation checks.
+        """
+        creating_new_pool = self.mode_create_new_pool_radio.get_active()
+        if creating_new_pool:
+            pool_name = self.new_pool_name_entry.get_text().strip()
+        else:
+            pool_name = self._selected_pool_name
+        dataset_name = self.dataset_entry.get_text().strip()
 
-        if self.mode_create_new_pool_radio.get_active():
-            # Validation for new pool creation
-            new_pool_name = self.new_pool_name_entry.get_text().strip()
-            if not new_pool_name:
-                self.warning_label.set_markup("<span foreground='red'>New pool name cannot be empty.</span>")
-                self.next_button.set_sensitive(False)
-                return
-            # Basic ZFS pool name validation (alphanumeric, underscores, hyphens, periods)
-            # Must start with a letter, cannot end with a hyphen.
-            if not new_pool_name[0].isalpha() or not all(c.isalnum() or c in ['_', '-', '.'] for c in new_pool_name) or new_pool_name.endswith('-'):
-                 self.warning_label.set_markup(f"<span foreground='red'>Invalid pool name: '{new_pool_name}'. Use letters, numbers, _, -, . and start with a letter.</span>")
-                 self.next_button.set_sensitive(False)
-                 return
-
-            selected_disks_count = sum(1 for row in self.new_pool_disk_store if row[0])
-            if selected_disks_count == 0:
-                self.warning_label.set_markup("<span foreground='red'>No disks selected for the new pool.</span>")
-                self.next_button.set_sensitive(False)
-                return
+        self._update_summary_panel(creating_new_pool, pool_name)
+        if creating_new_pool:
+            self._selection_valid, self._selection_warning = self._validate_new_pool(pool_name, dataset_name)
+        else:
+            self._selection_valid, self._selection_warning = self._validate_existing_pool(pool_name, dataset_name)
+        self._apply_validity()
+
+    def _on_password_changed(self, entry):
+        """Restart the 150 ms password-check timer on every keystroke."""
+        if self._password_pending:
+            GLib.source_remove(self._password_pending)
+        self._password_pending = GLib.timeout_add(150, self._flush_password_check)
+
+    def _flush_password_check(self):
+        self._password_pending = 0
+        self._apply_validity()
+        return False  # One-shot timeout source
+
+    def _on_password_focus_out(self, entry, event):
+        """Re-check only the password fields when one of them loses focus."""
+        if self._password_pending:
+            GLib.source_remove(self._password_pending)
+            self._password_pending = 0
+        self._apply_validity()
+        return False  # Let GTK continue its own focus-out handling
+
+    def _apply_validity(self):
+        """Show the last selection check plus a fresh encryption check.
+
+        Next is gated on the selection only: the password fields are checked once
+        typing pauses or on focus-out, and on_next refuses to proceed while they don't
+        match. Gating the button on them too would flicker it with every keystroke.
+        Labels whose markup is unchanged are not re-set, so Pango doesn't re-parse them.
+        """
+        _set_markup_if_changed(self.warning_label, self._selection_warning)
+        self.next_button.set_sensitive(self._selection_valid)
+        if self._selection_valid:
+            _encryption_valid, encryption_markup = self._check_encryption()
+            _set_markup_if_changed(self.encryption_status, encryption_markup)
+
+    def _check_encryption(self):
+        """Validate the encryption password fields. Returns (is_valid, status_markup)."""
+        if not self.encryption_check.get_active():
+            return True, ""
+
+        password = self.password_entry.get_text()
+        confirm = self.confirm_entry.get_text()
+        if not password:
+            return False, _MSG_EMPTY_PW
+        if password != confirm:
+            return False, _MSG_MISMATCH
+        if len(password) < 8:
+            # Still valid, just a warning
+            return True, _MSG_WEAK
+        return True, _MSG_OK
+
+    def _validate_new_pool(self, pool_name, dataset_name):
+        """Validate the new-pool settings. Returns (is_valid, warning_markup)."""
+        if not pool_name:
+            return False, "<span foreground='red'>New pool name cannot be empty.</span>"
+        # Basic ZFS pool name validation (alphanumeric, underscores, hyphens, periods)
+        # Must start with a letter, cannot end with a hyphen.
+        if not _POOL_NAME_RE.fullmatch(pool_name):
+            return False, f"<span foreground='red'>Invalid pool name: '{pool_name}'. Use letters, numbers, _, -, . and start with a letter.</span>"
+
+        selected_disks_count = len(self._selected_disks)
+        if selected_disks_count == 0:
+            return False, "<span foreground='red'>No disks selected for the new pool.</span>"
+
+        raid_type = _RAID_TYPES[self.new_pool_raid_type_combo.get_active()]
+        if selected_disks_count < _MIN_DISKS_PER_RAID.get(raid_type, 999): # Use 999 if raid_type not in map (should not happen)
+            return False, (
+                f"<span foreground='red'>{raid_type.upper()} requires at least {_MIN_DISKS_PER_RAID.get(raid_type)} disk(s). "
+                f"Selected: {selected_disks_count}.</span>"
+            )
 
-            raid_type = self.new_pool_raid_type_combo.get_active_text()
-            min_disks = {
-                "stripe": 1, "mirror": 2,
-                "raidz1": 3, # Common recommendation: N+1, N>=2 (so 2 data + 1 parity)
-                "raidz2": 4, # Common recommendation: N+2, N>=2 (so 2 data + 2 parity is min, better 3+ data) -> using slightly higher practical minimums
-                "raidz3": 5  # Common recommendation: N+3, N>=2 (so 2 data + 3 parity is min, better 3+ data)
-            }
-
-            if selected_disks_count < min_disks.get(raid_type, 999): # Use 999 if raid_type not in map (should not happen)
-                self.warning_label.set_markup(
-                    f"<span foreground='red'>{raid_type.upper()} requires at least {min_disks.get(raid_type)} disk(s). "
-                    f"Selected: {selected_disks_count}.</span>"
-                )
-                self.next_button.set_sensitive(False)
-                return
+        # Dataset name for new pool (can be simpler, e.g., always "ROOT/proxmox")
+        if not _DATASET_RE.fullmatch(dataset_name):
+            return False, "<span foreground='red'>Root dataset name for new pool must be in format: parent/child (e.g., ROOT/proxmox).</span>"
 
-            # Dataset name for new pool (can be simpler, e.g., always "ROOT/proxmox")
-            dataset_name = self.dataset_entry.get_text().strip()
-            if not dataset_name or '/' not in dataset_name : # Basic check
-                 self.warning_label.set_markup("<span foreground='red'>Root dataset name for new pool must be in format: parent/child (e.g., ROOT/proxmox).</span>")
-                 self.next_button.set_sensitive(False)
-                 return
+        return True, _MSG_VALID
 
-        else: # Using existing pool
-            selection = self.pool_tree.get_selection()
-            model, treeiter = selection.get_selected()
+    def _validate_existing_pool(self, pool_name, dataset_name):
+        """Validate the existing-pool target. Returns (is_valid, warning_markup)."""
+        if not pool_name:
+            return False, "<span foreground='red'>No existing ZFS pool selected.</span>"
 
-            if not treeiter:
-                self.warning_label.set_markup("<span foreground='red'>No existing ZFS pool selected.</span>")
-                self.next_button.set_sensitive(False)
-                return
+        pool_data = self.pool_info[pool_name] # Ensure pool_info is valid
 
-            pool_name = model[treeiter][0]
-            pool_data = self.pool_info[pool_name] # Ensure pool_info is valid
-            dataset_name = self.dataset_entry.get_text().strip()
+        if not _DATASET_RE.fullmatch(dataset_name):
+            return False, "<span foreground='red'>Target dataset name must be in format: pool/dataset (e.g., ROOT/proxmox).</span>"
 
-            if not dataset_name or '/' not in dataset_name:
-                self.warning_label.set_markup("<span foreground='red'>Target dataset name must be in format: pool/dataset (e.g., ROOT/proxmox).</span>")
-                self.next_button.set_sensitive(False)
-                return
+        if self.mode_replace.get_active():
+            if not pool_data.get('has_proxmox'):
+                return False, "<span foreground='red'>No existing Proxmox installation found to replace in selected pool.</span>"
 
-            if self.mode_replace.get_active():
-                has_proxmox = any(r['is_proxmox'] for r in pool_data.get('existing_roots', []))
-                if not has_proxmox:
-                    self.warning_label.set_markup("<span foreground='red'>No existing Proxmox installation found to replace in selected pool.</span>")
-                    self.next_button.set_sensitive(False)
-                    return
-
-            full_dataset_path = f"{pool_name}/{dataset_name.split('/', 1)[1] if '/' in dataset_name else dataset_name}"
-            exists = any(r['dataset'] == full_dataset_path for r in pool_data.get('existing_roots', []))
-            if exists and self.mode_new.get_active(): # mode_new is "Create new root dataset on existing pool"
-                self.warning_label.set_markup("<span foreground='red'>Dataset already exists on selected pool. Choose different name or mode.</span>")
-                self.next_button.set_sensitive(False)
-                return
+        full_dataset_path = f"{pool_name}/{dataset_name.split('/', 1)[1] if '/' in dataset_name else dataset_name}"
+        exists = full_dataset_path in self._pool_datasets[pool_name]
+        if exists and self.mode_new.get_active(): # mode_new is "Create new root dataset on existing pool"
+            return False, "<span foreground='red'>Dataset already exists on selected pool. Choose different name or mode.</span>"
 
-        # Common validation: Encryption (applies to both new and existing pool scenarios)
-        encryption_valid = True
-        if self.encryption_check.get_active():
-            password = self.password_entry.get_text()
-            confirm = self.confirm_entry.get_text()
-
-            if not password:
-                self.encryption_status.set_markup(
-                    "<span foreground='red'>Encryption password cannot be empty</span>"
-                )
-                encryption_valid = False
-            elif password != confirm:
-                self.encryption_status.set_markup(
-                    "<span foreground='red'>Passwords do not match</span>"
-                )
-                encryption_valid = False
-            elif len(password) < 8:
-                self.encryption_status.set_markup(
-                    "<span foreground='orange'>Warning: Password is less than 8 characters</span>"
-                )
-                # Still valid, just a warning
-                encryption_valid = True
-            else:
-                self.encryption_status.set_markup(
-                    "<span foreground='green'>✓ Passwords match</span>"
-                )
-        else:
-            self.encryption_status.set_markup("")
+        return True, _MSG_VALID
 
-        # All good
-        if encryption_valid:
-            self.warning_label.set_markup("<span foreground='green'>✓ Valid selection</span>")
-            self.next_button.set_sensitive(True)
-        else:
-            self.next_button.set_sensitive(False)
+    def _flush_pending_updates(self):
+        """Run any debounced advanced-settings update and queued validation right now."""
+        if self._advanced_pending:
+            GLib.source_remove(self._advanced_pending)
+            self._flush_advanced_update()  # Queues a validation pass, run just below
+        if self._password_pending:
+            GLib.source_remove(self._password_pending)
+            self._password_pending = 0  # _check_encryption in on_next covers it
+        if self._validate_pending:
+            GLib.source_remove(self._validate_pending)
+            self._do_validate()
 
     def on_next(self, widget):
         """Handle next button"""
-        # Determine operation mode (new_pool or existing_pool)
-        if self.mode_create_new_pool_radio.get_active():
-            libcalamares.globalstorage.insert("zfs_operation_mode", "new_pool")
-
-            # --- Collect data for new pool creation ---
-            collected_pool_name = self.new_pool_name_entry.get_text().strip()
-            collected_raid_type = self.new_pool_raid_type_combo.get_active_text()
-
-            selected_disks = []
-            for row in self.new_pool_disk_store:
-                if row[0]: # If selected
-                    selected_disks.append(row[1]) # Get device path
-
-            ashift_text = self.ashift_combo.get_active_text()
-            collected_ashift = int(ashift_text) if ashift_text != "Auto-detect" else None
-
-            # Pool properties (currently only ashift is explicitly set at pool level by build_zpool_create_command)
-            pool_props = {} # Empty for now, can be extended
-
-            # Root filesystem options
-            root_fs_opts = {}
-            comp_algo = self.compression_algo_combo.get_active_text()
-            if comp_algo == "zstd":
-                zstd_level = self.zstd_level_scale.get_value_as_int()
-                root_fs_opts["compression"] = f"zstd-{zstd_level}"
-            else:
-                root_fs_opts["compression"] = comp_algo
-
-            record_size_text = self.recordsize_combo.get_active_text()
-            if record_size_text == "Default (128K)":
-                root_fs_opts["recordsize"] = "128K"
-            else:
-                root_fs_opts["recordsize"] = record_size_text
-
-            root_fs_opts["atime"] = self.atime_combo.get_active_text()
-            root_fs_opts["xattr"] = self.xattr_combo.get_active_text()
-            root_fs_opts["dnodesize"] = self.dnodesize_combo.get_active_text()
-
-            encryption_enabled = self.encryption_check.get_active()
-            if encryption_enabled:
-                root_fs_opts["encryption"] = "on" # Standard ZFS property
-                # build_zpool_create_command doesn't handle keyformat/keylocation directly for root_fs_opts.
-                # These are usually handled by `zfs create -o keyformat=passphrase ...` after pool.
-                # For `zpool create`, encryption is simpler: just `-O encryption=on`.
-                # The password needs to be handled by Calamares during the `zpool create` or subsequent `zfs load-key`.
-                # We will store these separately for Calamares to use.
-                libcalamares.globalstorage.insert("zfs_encryption_keyformat", "passphrase")
-                libcalamares.globalstorage.insert("zfs_encryption_keylocation", "prompt")
-
-
-            # L2ARC devices
-            l2arc_devices_str = self.l2arc_devices_entry.get_text().strip()
-            collected_l2arc_devices = l2arc_devices_str.split() if l2arc_devices_str else []
-
-            # SLOG devices (not in UI yet)
-            collected_slog_devices = []
-
-            # altroot - Calamares usually provides this as a job parameter (e.g. globalStorage['rootMountPoint'])
-            # For command generation testing, a placeholder.
-            # In a real scenario, this should be the actual target chroot path.
-            altroot_path = libcalamares.globalstorage.value("rootMountPoint") or "/mnt"
-
-
-            # Mountpoint for the pool's root dataset.
-            # For a root pool, this is typically '/', meaning it will be mounted at altroot_path.
-            # If self.dataset_entry is "ROOT/pve", the actual root dataset of the pool is just the pool itself.
-            # Child datasets are created later.
-            # The mountpoint for the pool itself. If datasets within it have their own mountpoints,
-            # this can be 'none' or 'legacy'. For a root filesystem, it's often '/'.
-            pool_mountpoint = "/" # This will make the pool's root dataset mount at altroot_path
+        # A slider drag or keystroke from the last few ms may still be waiting on its
+        # debounce timer; settle it so Next acts on what is on screen
+        self._flush_pending_updates()
+        if not self._selection_valid:
+            return
 
-            try:
-                zpool_command_args = build_zpool_create_command(
-                    pool_name=collected_pool_name,
-                    raid_type=collected_raid_type,
-                    disks=selected_disks,
-                    ashift=collected_ashift,
-                    properties=pool_props, # Pool level -o
-                    root_fs_options=root_fs_opts, # Root dataset -O
-                    mountpoint=pool_mountpoint,
-                    altroot=altroot_path,
-                    log_devices=collected_slog_devices, # SLOG
-                    cache_devices=collected_l2arc_devices # L2ARC
-                )
-                libcalamares.globalstorage.insert("zfs_new_pool_command", zpool_command_args)
-                libcalamares.utils.debug(f"Generated zpool create command: {' '.join(zpool_command_args)}")
-
-            except ValueError as e:
-                libcalamares.utils.error(f"Error building zpool command: {e}")
-                # This should ideally not happen if validate_selection is robust
-                # but good to have a fallback.
-                self.warning_label.set_markup(f"<span foreground='red'>Error: {e}</span>")
-                self.next_button.set_sensitive(False)
-                return # Prevent window close
-
-            libcalamares.globalstorage.insert("zfs_new_pool_name", collected_pool_name)
-            # The 'install_dataset' for a new pool refers to the intended root filesystem dataset path *within* the new pool.
-            # e.g. if new pool is 'rpool' and dataset_entry is 'ROOT/pve', then install_dataset is 'rpool/ROOT/pve'
-            # However, zpool create only creates 'rpool'. 'ROOT/pve' must be created by subsequent zfs create commands.
-            # For now, store the user's intended root dataset path relative to the new pool.
-            install_dataset_on_new_pool = self.dataset_entry.get_text().strip()
-            libcalamares.globalstorage.insert("zfs_install_dataset_relative", install_dataset_on_new_pool)
-
-
-            # Store global settings that also apply to new pool scenario
-            libcalamares.globalstorage.insert("zfs_arc_max_gb", int(self.arc_max_gb_spinbutton.get_value()))
-            libcalamares.globalstorage.insert("zfs_encryption_enabled", encryption_enabled)
-            if encryption_enabled:
-                libcalamares.globalstorage.insert("zfs_encryption_password", self.password_entry.get_text())
-            else:
-                libcalamares.globalstorage.insert("zfs_encryption_password", "")
-
-            # For the main 'selected' dict to return to Calamares core for summary
-            self.selected = {
-                'pool': collected_pool_name, # The new pool name
-                'dataset': f"{collected_pool_name}/{install_dataset_on_new_pool.split('/',1)[1] if '/' in install_dataset_on_new_pool else install_dataset_on_new_pool}", # Full path for install
-                'mode': "new_pool", # Custom mode indicating new pool
-                'encryption_enabled': encryption_enabled,
-                # Not storing password in self.selected for security in logs
-                'encryption_algorithm': self.algorithm_combo.get_active_text() if encryption_enabled else ""
-            }
-
-        else: # Use Existing Pool Mode
-            libcalamares.globalstorage.insert("zfs_operation_mode", "existing_pool")
-
-            selection = self.pool_tree.get_selection()
-            model, treeiter = selection.get_selected()
-            if not treeiter: # Should be caught by validate_selection
-                self.window.destroy() # Or show error
-                return
+        # Password fields are only checked once typing pauses; make sure the final values match
+        encryption_valid, encryption_markup = self._check_encryption()
+        if not encryption_valid:
+            self.encryption_status.set_markup(encryption_markup)
+            self.next_button.set_sensitive(False)
+            return
 
-            pool_name = model[treeiter][0]
-            dataset_name_suffix = self.dataset_entry.get_text().strip() # e.g. ROOT/proxmox
-
-            # Construct full dataset path
-            # If dataset_name_suffix contains '/', it's like "parent/child", use the part after first '/'
-            # Otherwise, assume it's a direct child of the pool_name.
-            # This logic might need refinement based on how users are expected to input dataset names.
-            # For now, assume dataset_entry is relative to the pool root if it doesn't contain the pool name.
-            if '/' in dataset_name_suffix:
-                 actual_dataset_name = dataset_name_suffix # e.g. ROOT/proxmox
-            else: # E.g. user types 'mydata' -> pool_name/mydata
-                 actual_dataset_name = dataset_name_suffix
-
-            full_dataset_path = f"{pool_name}/{actual_dataset_name}"
-
-
-            install_mode = "new" # Default for existing pool is creating a new dataset
-            if self.mode_replace.get_active():
-                install_mode = "replace"
-            elif self.mode_alongside.get_active():
-                install_mode = "alongside"
-
-            encryption_enabled = self.encryption_check.get_active()
-
-            self.selected = {
-                'pool': pool_name,
-                'dataset': full_dataset_path, # This is the key Calamares uses for partitioning.
-                'mode': install_mode,
-                'encryption_enabled': encryption_enabled,
-                'encryption_password': self.password_entry.get_text() if encryption_enabled else "", # For globalstorage
-                'encryption_algorithm': self.algorithm_combo.get_active_text() if encryption_enabled else ""
-            }
-            # Store legacy globalstorage items for existing pool installs
-            libcalamares.globalstorage.insert("install_pool", self.selected['pool'])
-            libcalamares.globalstorage.insert("install_dataset", self.selected['dataset']) # Full path
-            libcalamares.globalstorage.insert("install_mode", self.selected['mode'])
-            libcalamares.globalstorage.insert("encryption_enabled", self.selected['encryption_enabled'])
-            if self.selected['encryption_enabled']:
-                libcalamares.globalstorage.insert("encryption_password", self.selected['encryption_password'])
-                libcalamares.globalstorage.insert("encryption_algorithm", self.selected['encryption_algorithm'])
-            else: # Clear them if disabled
-                 libcalamares.globalstorage.insert("encryption_password", "")
-                 libcalamares.globalstorage.insert("encryption_algorithm", "")
-
-
-            # Global settings also apply here
-            libcalamares.globalstorage.insert("zfs_arc_max_gb", int(self.arc_max_gb_spinbutton.get_value()))
-            # For existing pools, encryption settings on datasets are more complex (inherit, on, off, new keys)
-            # The current UI implies setting encryption on the new dataset being created.
-            # If encryption is enabled, it means the new dataset should be encrypted.
-            libcalamares.globalstorage.insert("zfs_encryption_keyformat", "passphrase" if encryption_enabled else "")
-            libcalamares.globalstorage.insert("zfs_encryption_keylocation", "prompt" if encryption_enabled else "")
-
-
-        libcalamares.utils.debug(f"ZFSTargetSelector final selection for Calamares: {self.selected}")
+        form = self._snapshot_form()
+
+        # Building and dry-running the zpool command can take a moment (zpool probes
+        # the disks), so it runs off the main loop; _apply_and_close finishes up
+        self.next_button.set_sensitive(False)
+        threading.Thread(target=self._finalize_worker, args=(form,),
+                         name="zfs-finalize", daemon=True).start()
+
+    def _finalize_worker(self, form):
+        """Worker thread: run _finalize_selection and hand the result to the main loop."""
+        try:
+            result = _finalize_selection(form)
+        except Exception as e:
+            libcalamares.utils.error(f"Failed to finalize the ZFS selection: {e}")
+            result = (None, None, f"<span foreground='red'>Error: {GLib.markup_escape_text(str(e))}</span>")
+        GLib.idle_add(self._apply_and_close, *result)
+
+    def _apply_and_close(self, selected, updates, error_markup):
+        """Idle callback: store a finished selection and close, or show why it failed.
+
+        Global storage is written here, on the main loop, as Calamares expects.
+        """
+        if self._window_closed:
+            return False  # Cancelled while the worker ran; drop the result
+        if error_markup:
+            self.warning_label.set_markup(error_markup)
+            return False  # Next stays insensitive until the form changes again
+        self.selected = selected
+        gs = libcalamares.globalstorage
+        for key, value in (updates or {}).items():
+            gs.insert(key, value)
+        del updates  # Holds the passphrase too
+
+        # The passphrase is in global storage now; don't keep it in the entries'
+        # buffers for as long as the window object lingers
+        for entry in (self.password_entry, self.confirm_entry):
+            entry.set_text("")
+        if self._password_pending:  # Queued by the clearing above; nothing left to check
+            GLib.source_remove(self._password_pending)
+            self._password_pending = 0
+
+        if _DEBUG and selected is not None:
+            # Same redaction as run(): the passphrase never goes to the log
+            logged = {k: v for k, v in selected.items() if k != 'encryption_password'}
+            libcalamares.utils.debug(f"ZFSTargetSelector final selection for Calamares: {logged}")
         self.window.destroy()
+        return False  # One-shot idle source
+
+    def _snapshot_form(self):
+        """Read every dialog value on_next needs, in one pass over the widgets.
+
+        The advanced settings are copied from self._state; the password and
+        algorithm are "" when encryption is off.
+        """
+        creating_new_pool = self.mode_create_new_pool_radio.get_active()
+        encryption_enabled = self.encryption_check.get_active()
+        install_mode = "new" # Default for existing pool is creating a new dataset
+        if self.mode_replace.get_active():
+            install_mode = "replace"
+        elif self.mode_alongside.get_active():
+            install_mode = "alongside"
+        return {
+            "creating_new_pool": creating_new_pool,
+            "new_pool_name": self.new_pool_name_entry.get_text().strip(),
+            "raid_type": _RAID_TYPES[self.new_pool_raid_type_combo.get_active()],
+            "disks": list(self._selected_disks),
+            "existing_pool_name": self._selected_pool_name,
+            "install_mode": install_mode,
+            "dataset": self.dataset_entry.get_text().strip(),
+            "encryption_enabled": encryption_enabled,
+            "encryption_password": self.password_entry.get_text() if encryption_enabled else "",
+            "encryption_algorithm": _ENCRYPTION_ALGORITHMS[self.algorithm_combo.get_active()] if encryption_enabled else "",
+            "advanced": dict(self._state),
+            # Calamares usually provides the target root here; /mnt is a placeholder
+            "altroot": libcalamares.globalstorage.value("rootMountPoint") or "/mnt",
+        }
 
     def on_cancel(self, widget):
         """Handle cancel"""
         self.selected = None
         self.window.destroy()
 
+    def _on_window_destroy(self, widget):
+        self._window_closed = True
+        if self._udev_watch:
+            GLib.source_remove(self._udev_watch)
+            self._udev_watch = 0
+        if self._loop is not None:
+            self._loop.quit()
+
+    def _start_udev_monitor(self):
+        """Watch udev for whole-disk add/remove so a hotplugged disk shows up without reopening."""
+        self._udev_monitor = None
+        self._udev_watch = 0
+        if pyudev is None:
+            return
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by('block', device_type='disk')
+            monitor.start()
+        except (OSError, pyudev.DeviceNotFoundError) as e:
+            libcalamares.utils.warning(f"Disk hotplug monitoring unavailable: {e}")
+            return
+        self._udev_monitor = monitor
+        self._udev_watch = GLib.io_add_watch(monitor.fileno(), GLib.PRIORITY_DEFAULT,
+                                             GLib.IOCondition.IN, self._on_udev_event)
+
+    def _on_udev_event(self, fd, condition):
+        """GLib IO watch: drop the cached scan and rescan if the disk list is on screen.
+
+        Only add/remove events count; 'change' events (partition table rewrites,
+        media checks) leave the set of disks as it was.
+        """
+        disks_changed = False
+        # Drain the burst; one rescan covers all of it
+        device = self._udev_monitor.poll(timeout=0)
+        while device is not None:
+            disks_changed = disks_changed or device.action in ("add", "remove")
+            device = self._udev_monitor.poll(timeout=0)
+        if not disks_changed:
+            return True  # Keep watching
+        _LSBLK_CACHE.invalidate()
+        if self._cached_disks is not None and self.mode_create_new_pool_radio.get_active():
+            self._populate_available_disks(force=True)
+        else:
+            self._cached_disks = None  # Rescanned next time the disk list is shown
+        return True  # Keep watching
+
     def run(self):
-        """Run the dialog"""
-        Gtk.main()
+        """Run the dialog on a loop of its own that quits when the window goes away.
+
+        A GLib.MainLoop iterates the default context like the host's loop does, so
+        Calamares' own sources keep firing, and it doesn't touch the global
+        Gtk.main() nesting level the host may be relying on.
+        """
+        self._loop = GLib.MainLoop()
+        self._loop.run()
+        self._loop = None
 
     def get_selected(self):
         """Get the selection result"""
@@ -13,11 +13,143 @@ configures `dracut`, an initramfs generator, which is essential for booting
 the final ISO, especially with ZFS root filesystems.
 """
 
+import atexit
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import socket
 import subprocess
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, List, Any
+from typing import Deque, Dict, Iterator, Optional, List, Any
 import logging
 
+from builder.utils.file_io import write_file
+
+# Default mirror; builder_config.debian_mirror overrides it
+DEFAULT_DEBIAN_MIRROR = "http://deb.debian.org/debian"
+# Where a local apt-cacher-ng listens when one is running
+APT_CACHER_ADDRESS = ("127.0.0.1", 3142)
+# Lines of chroot command output kept for error reports
+CHROOT_OUTPUT_TAIL = 50
+# Keep existing config files without prompting when a package ships a new one
+DPKG_CONF_OPTIONS = ["-o", "Dpkg::Options::=--force-confdef", "-o", "Dpkg::Options::=--force-confold"]
+# Bump when the chroot setup steps change, so cached chroots are rebuilt (the
+# files written into the chroot are hashed into the cache key already)
+CHROOT_CACHE_VERSION = 3
+# Cached chroots older than this are rebuilt rather than restored
+CHROOT_CACHE_MAX_AGE = 7 * 24 * 3600
+
+# APT download tuning (etc/apt/apt.conf.d/99zforge-parallel)
+APT_PARALLEL_CONF: bytes = (b'Acquire::Queue-Mode "access";\n'
+                            b'Acquire::http::Pipeline-Depth "10";\n'
+                            b'Acquire::Retries "3";\n')
+# Used during this module's installs only (etc/apt/apt.conf.d/99no-recommends)
+NO_RECOMMENDS_CONF: bytes = (b'APT::Install-Recommends "false";\n'
+                             b'APT::Install-Suggests "false";\n')
+
+# Packages debootstrap adds to the minimal base system
+INCLUDE_PACKAGES: List[str] = [
+    "locales",        # For locale generation
+    "linux-base",     # Basic Linux system files
+    "systemd",        # Init system; dracut's systemd module builds the initramfs on it
+    "systemd-sysv",   # /sbin/init -> systemd (minbase has no init at all)
+    "udev",           # Device manager, needed by the initramfs and the booted system
+    "kmod",           # modprobe/depmod for loading kernel modules (ZFS)
+    "sudo",           # For privilege escalation
+    "apt-transport-https", # For HTTPS APT repositories
+    "ca-certificates",# For SSL/TLS certificate validation
+    "curl", "wget",   # For downloading files
+    "gnupg"           # For package signing and verification
+]
+
+# Essential packages for a functional system and for subsequent build steps
+ESSENTIAL_PACKAGES: List[str] = [
+    "build-essential",  # For compiling software (e.g., ZFS DKMS modules)
+    "python3",          # Python interpreter
+    "python3-distutils",# For Python package building/installation
+    "vim",              # Text editor
+    "less", "htop",     # System utilities
+    "iproute2",         # Modern networking utilities (e.g., ip addr)
+    "iputils-ping"      # For network diagnostics
+]
+
+# dracut and related packages
+DRACUT_PACKAGES: List[str] = [
+    "dracut",         # Core dracut utility
+    "dracut-core",    # Core dracut modules
+    "dracut-network", # Modules for network support in initramfs (e.g., for network unlock)
+    "dracut-squash"   # Modules for squashfs, if live media uses it directly
+]
+
+# Default hostname for the system being built
+HOSTNAME_CONTENT: bytes = b"zforge\n"
+
+# /etc/hosts for the built system
+HOSTS_CONTENT: bytes = b"""127.0.0.1   localhost
+127.0.1.1   zforge
+
+# The following lines are desirable for IPv6 capable hosts
+::1     localhost ip6-localhost ip6-loopback
+ff02::1 ip6-allnodes
+ff02::2 ip6-allrouters
+192.168.0.1 
+9.9.9.9
+"""
+
+# A minimal /etc/fstab; the installer generates the real one
+FSTAB_CONTENT: bytes = b"""# /etc/fstab: static file system information.
+# Use 'blkid' to print the universally unique identifier for a
+# device; this may be used with UUID= as a more robust way to name devices
+# that works even if disks are added and removed.
+
+# <file system>  <mount point>  <type>  <options>  <dump>  <pass>
+proc             /proc          proc    defaults   0       0
+"""
+
+# Base dracut configuration for Z-Forge (etc/dracut.conf.d/zforge.conf).
+# Ensures ZFS, systemd, and NVMe support are included, sets compression to zstd
+# and enables hostonly mode for a smaller initramfs.
+DRACUT_CONF: bytes = b"""# Z-Forge dracut configuration (etc/dracut.conf.d/zforge.conf)
+
+# Compression method for the initramfs: zstd on all cores (-T0) at a low level (-3).
+# Slightly larger than dracut's default zstd level, but compresses far faster.
+compress="zstd -q -T0 -3"
+
+# Add dracut modules necessary for ZFS root and systemd.
+add_dracutmodules+=" zfs systemd "
+
+# Ensure ZFS filesystem type is recognized by dracut.
+filesystems+=" zfs "
+
+# Enable hostonly mode: creates a smaller initramfs tailored to the current hardware.
+# For a generic ISO, this might be set to "no", or specific drivers added.
+# However, 'hostonly="yes"' is often used even for ISOs if the kernel/drivers are generic enough.
+hostonly="yes"
+
+# Kernel command line parameters to be embedded in the initramfs.
+# 'root=zfs:AUTO' tells the system to find the ZFS root pool automatically.
+kernel_cmdline="root=zfs:AUTO"
+
+# Add any additional drivers needed, e.g., for NVMe drives.
+add_drivers+=" nvme "
+"""
+
+@lru_cache(maxsize=1)
+def _debootstrap_has_cache_dir() -> bool:
+    """Return True if the installed debootstrap accepts --cache-dir."""
+
+    try:
+        result = subprocess.run(["debootstrap", "--help"], capture_output=True, text=True)
+    except OSError:
+        return False
+    return "--cache-dir" in result.stdout
+
 class Debootstrap:
     """
     Handles the Debian bootstrapping process into a chroot directory.
@@ -44,6 +176,22 @@ class Debootstrap:
         self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
         # Define the path for the chroot environment.
         self.chroot_path: Path = workspace / "chroot"
+        builder_config: Dict[str, Any] = self.config.get('builder_config', {})
+        # Debian mirror for debootstrap and the chroot's sources.list.
+        self.mirror: str = builder_config.get('debian_mirror') or DEFAULT_DEBIAN_MIRROR
+        # Whether package downloads go through a local apt-cacher-ng.
+        self.cache_packages: bool = builder_config.get('cache_packages', True)
+        # HTTP proxy for package downloads during the build, set by execute() on the
+        # paths that download packages.
+        self.apt_proxy: Optional[str] = None
+        # Whether the base system is upgraded from the -updates/-security suites.
+        self.upgrade_packages: bool = builder_config.get('upgrade_packages', True)
+        # Whether the configured chroot is kept as a tarball for identical later builds.
+        self.cache_chroot: bool = builder_config.get('cache_chroot', True)
+        # Environment for commands run in the chroot; APT never stops to ask, and the
+        # C locale avoids locale warnings before locale-gen has run.
+        self._chroot_env: Dict[str, str] = {**os.environ, "DEBIAN_FRONTEND": "noninteractive",
+                                            "LC_ALL": "C"}
         
     def execute(self, resume_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
@@ -85,14 +233,40 @@ class Debootstrap:
             # Ensure the chroot parent directory exists.
             self.chroot_path.mkdir(parents=True, exist_ok=True)
 
+            # An earlier build with the same configuration left a tarball of its chroot.
+            cache_path: Optional[Path] = self._chroot_cache_path(debian_release)
+            if cache_path and self._chroot_cache_fresh(cache_path):
+                self._restore_chroot(cache_path)
+                # Pick up updates published since the tarball was made.
+                if self.upgrade_packages:
+                    if self.cache_packages:
+                        self.apt_proxy = self._ensure_apt_cache()
+                    with self._temporary_apt_config():
+                        self.logger.info("Upgrading restored chroot...")
+                        self._run_chroot_script(
+                            "apt-get update\n" + shlex.join(["apt-get", "upgrade", "-y"] + DPKG_CONF_OPTIONS) + "\n")
+                return {
+                    'status': 'success',
+                    'debian_release': debian_release,
+                    'chroot_path': str(self.chroot_path),
+                    'completed': True
+                }
+
             # Step 1: Run the debootstrap command.
+            if self.cache_packages:
+                self.apt_proxy = self._ensure_apt_cache()
             self._run_debootstrap(debian_release)
+            self._write_apt_tuning()
             
-            # Step 2: Configure the basic system settings within the chroot.
-            self._configure_system(debian_release)
-            
-            # Step 3: Install and configure dracut.
-            self._install_dracut()
+            with self._temporary_apt_config():
+                # Step 2: Configure the basic system settings within the chroot.
+                self._configure_system(debian_release)
+
+                # Step 3: Configure dracut and install the packages in one transaction.
+                self._install_packages()
+
+            if cache_path:
+                self._save_chroot(cache_path)
             
             self.logger.info(f"Debootstrap completed successfully for Debian {debian_release}.")
             
@@ -118,10 +292,223 @@ class Debootstrap:
                 'module': self.__class__.__name__
             }
     
+    @contextmanager
+    def _temporary_apt_config(self) -> Iterator[None]:
+        """
+        Apply build-only dpkg/APT settings in the chroot for the duration of the block.
+
+        The files are removed again afterwards, even on failure, so later
+        modules and the shipped image keep Debian's defaults.
+        """
+
+        # dpkg skips its per-file fsync for the package installs.
+        speedup_path: Path = self.chroot_path / "etc/dpkg/dpkg.cfg.d/02apt-speedup"
+        speedup_path.parent.mkdir(parents=True, exist_ok=True)
+        write_file(speedup_path, b"force-unsafe-io\n")
+        # Recommends and Suggests are skipped for this module's installs only, keeping
+        # the base small without changing what later modules' installs pull in.
+        no_recommends_path: Path = self.chroot_path / "etc/apt/apt.conf.d/99no-recommends"
+        no_recommends_path.parent.mkdir(parents=True, exist_ok=True)
+        write_file(no_recommends_path, NO_RECOMMENDS_CONF)
+        # Likewise, chroot downloads go through the local cache only for this build.
+        proxy_path: Path = self.chroot_path / "etc/apt/apt.conf.d/01zforge-proxy"
+        if self.apt_proxy:
+            proxy_path.parent.mkdir(parents=True, exist_ok=True)
+            write_file(proxy_path, f'Acquire::http::Proxy "{self.apt_proxy}";\n'.encode())
+        try:
+            yield
+        finally:
+            speedup_path.unlink(missing_ok=True)
+            no_recommends_path.unlink(missing_ok=True)
+            proxy_path.unlink(missing_ok=True)
+
+    def _chroot_cache_fresh(self, cache_path: Path) -> bool:
+        """Return True if `cache_path` exists and is younger than CHROOT_CACHE_MAX_AGE."""
+
+        try:
+            age: float = time.time() - cache_path.stat().st_mtime
+        except OSError:
+            return False
+        if age > CHROOT_CACHE_MAX_AGE:
+            self.logger.info(f"Cached chroot {cache_path} is {age / 86400:.0f} days old; rebuilding it")
+            return False
+        return True
+
+    def _chroot_cache_path(self, debian_release: str) -> Optional[Path]:
+        """
+        Return the tarball path for a chroot built from the current configuration.
+
+        The file name is a hash of everything that shapes the chroot, so any
+        change to the release, mirror, package lists or the contents of the
+        files written into the chroot selects a new tarball.
+
+        Returns:
+            The path under `<workspace parent>/cache/chroots`, or None if chroot
+            caching is disabled or zstd is not installed.
+        """
+
+        if not self.cache_chroot or not shutil.which("zstd"):
+            return None
+        key: str = hashlib.sha256(json.dumps({
+            'version': CHROOT_CACHE_VERSION,
+            'debian_release': debian_release,
+            'mirror': self.mirror,
+            'include_packages': INCLUDE_PACKAGES,
+            'essential_packages': ESSENTIAL_PACKAGES,
+            'dracut_packages': DRACUT_PACKAGES,
+            'upgrade_packages': self.upgrade_packages,
+            'files': [hashlib.sha256(content).hexdigest() for content in (
+                self._sources_content(debian_release), HOSTNAME_CONTENT, HOSTS_CONTENT, FSTAB_CONTENT,
+                DRACUT_CONF, APT_PARALLEL_CONF, NO_RECOMMENDS_CONF)]
+        }, sort_keys=True).encode()).hexdigest()
+        return self.workspace.parent / "cache/chroots" / f"{key}.tar.zst"
+
+    def _restore_chroot(self, cache_path: Path) -> None:
+        """
+        Provide the chroot from a cached tarball.
+
+        The tarball is unpacked once into a shared base directory next to it;
+        each build then mounts an overlay of that base on the chroot path, so
+        builds (and build variants) share one copy of the base system and
+        only store their own changes. If the overlay cannot be mounted, the
+        tarball is unpacked straight into the chroot instead.
+        """
+
+        # Named after the tarball's mtime too, so a rebuilt tarball gets a fresh base.
+        base_path: Path = cache_path.parent / f"{cache_path.name.split('.', 1)[0]}-{cache_path.stat().st_mtime_ns}"
+        try:
+            if not base_path.is_dir():
+                self.logger.info(f"Unpacking {cache_path} into {base_path}...")
+                # Unpack under a private name; a concurrent build may win the rename.
+                tmp_path: Path = base_path.with_name(f"{base_path.name}.part-{os.getpid()}")
+                tmp_path.mkdir(parents=True)
+                try:
+                    self._unpack_chroot(cache_path, tmp_path)
+                    tmp_path.rename(base_path)
+                except OSError:
+                    if not base_path.is_dir():
+                        raise
+                finally:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+            self._mount_overlay(base_path)
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.logger.warning(f"Could not mount the cached chroot as an overlay ({e}); unpacking it instead")
+            self._unpack_chroot(cache_path, self.chroot_path)
+
+    def _unpack_chroot(self, cache_path: Path, target: Path) -> None:
+        """Unpack a cached chroot tarball into `target`."""
+
+        self.logger.info(f"Restoring chroot from {cache_path}...")
+        subprocess.run(["tar", "-I", "zstd -T0", "--numeric-owner", "-xpf", str(cache_path),
+                        "-C", str(target)], check=True)
+
+    def _mount_overlay(self, base_path: Path) -> None:
+        """
+        Mount an overlay of `base_path` on the chroot path.
+
+        The base stays read-only; this build's changes go to
+        `workspace/chroot_upper`, which starts empty. The merged view is mounted
+        on `workspace/chroot` itself, so later modules need no changes. It is
+        unmounted when the builder exits.
+        """
+
+        upper_path: Path = self.workspace / "chroot_upper"
+        work_path: Path = self.workspace / "chroot_work"
+        for path in (upper_path, work_path):
+            shutil.rmtree(path, ignore_errors=True)
+            path.mkdir(parents=True)
+        self.logger.info(f"Mounting overlay of {base_path} on {self.chroot_path}...")
+        subprocess.run(["mount", "-t", "overlay", "overlay", "-o",
+                        f"lowerdir={base_path},upperdir={upper_path},workdir={work_path}",
+                        str(self.chroot_path)], check=True, capture_output=True, text=True)
+        # Lazy, so mounts later modules made inside the chroot don't block it.
+        atexit.register(subprocess.run, ["umount", "-l", str(self.chroot_path)], check=False)
+
+    def _save_chroot(self, cache_path: Path) -> None:
+        """
+        Pack the configured chroot into `cache_path` for later builds.
+
+        The tarball is written under a temporary name and renamed into place,
+        so an interrupted build never leaves a truncated cache entry. Failure
+        only costs the next build its shortcut, so it is logged, not raised.
+        """
+
+        self.logger.info(f"Caching chroot as {cache_path}...")
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path: Path = cache_path.with_name(cache_path.name + ".part")
+        try:
+            subprocess.run(["tar", "--sort=none", "-I", "zstd -T0 -3", "--numeric-owner", "-cpf",
+                            str(tmp_path), "-C", str(self.chroot_path), "."],
+                           check=True, capture_output=True, text=True)
+            tmp_path.replace(cache_path)
+            # Bases unpacked from the tarball this one replaces are out of date.
+            for old_base in cache_path.parent.glob(f"{cache_path.name.split('.', 1)[0]}-*"):
+                shutil.rmtree(old_base, ignore_errors=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            tmp_path.unlink(missing_ok=True)
+            self.logger.warning(f"Could not cache the chroot: {e}")
+
+    def _ensure_apt_cache(self) -> Optional[str]:
+        """
+        Find, or start, an apt-cacher-ng instance on the build host.
+
+        If nothing is listening on the apt-cacher-ng port, the service is
+        started through systemd when it is installed. Package downloads then go
+        through it as an HTTP proxy; the mirror URLs themselves stay unchanged,
+        so the built system's sources point at the real mirror.
+
+        Returns:
+            The proxy URL if apt-cacher-ng is listening, otherwise None (direct
+            downloads from the mirror).
+        """
+
+        if not self._apt_cache_listening(0.05):
+            if not shutil.which("systemctl"):
+                return None
+            try:
+                started = subprocess.run(["systemctl", "start", "apt-cacher-ng"],
+                                         capture_output=True, text=True, timeout=30)
+            except (OSError, subprocess.TimeoutExpired):
+                return None
+            # A non-zero status usually means the service isn't installed.
+            if started.returncode != 0 or not self._apt_cache_listening(1.0):
+                return None
+            self.logger.info("Started apt-cacher-ng")
+        proxy: str = f"http://{APT_CACHER_ADDRESS[0]}:{APT_CACHER_ADDRESS[1]}"
+        self.logger.info(f"Using local apt cache at {proxy}")
+        return proxy
+
+    def _apt_cache_listening(self, timeout: float) -> bool:
+        """Return True if something accepts connections on the apt-cacher-ng port."""
+
+        try:
+            with socket.create_connection(APT_CACHER_ADDRESS, timeout=timeout):
+                return True
+        except OSError:
+            return False
+
+    def _write_apt_tuning(self) -> None:
+        """
+        Configure APT in the chroot to pipeline and retry its downloads.
+
+        Pipelining keeps several requests in flight per mirror connection, so
+        the many small .deb downloads overlap instead of each paying a round trip.
+        """
+
+        apt_conf_path: Path = self.chroot_path / "etc/apt/apt.conf.d/99zforge-parallel"
+        apt_conf_path.parent.mkdir(parents=True, exist_ok=True)
+        write_file(apt_conf_path, APT_PARALLEL_CONF)
+        self.logger.debug(f"Configured {apt_conf_path}")
+
     def _run_debootstrap(self, debian_release: str) -> None:
         """
         Execute the `debootstrap` command to create the minimal Debian system.
 
+        `mmdebstrap` is used instead when it is installed. Either way the
+        downloaded packages are cached in `<workspace parent>/cache/debootstrap`
+        for the next build; a debootstrap too old for `--cache-dir` runs
+        uncached.
+
         Args:
             debian_release: The target Debian release name (e.g., "bookworm").
 
@@ -131,36 +518,59 @@ class Debootstrap:
 
         self.logger.info(f"Running debootstrap for Debian {debian_release} into {self.chroot_path}...")
 
-        # Define essential packages to include in the base system.
-        include_packages: List[str] = [
-            "locales",        # For locale generation
-            "linux-base",     # Basic Linux system files
-            "sudo",           # For privilege escalation
-            "bash-completion",# Shell completion
-            "apt-transport-https", # For HTTPS APT repositories
-            "ca-certificates",# For SSL/TLS certificate validation
-            "curl", "wget",   # For downloading files
-            "gnupg"           # For package signing and verification
-        ]
-        
-        # Construct the debootstrap command.
+        # Downloaded .debs are kept under the workspace's parent so that repeated
+        # builds copy them locally instead of fetching them again.
+        cache_dir: Path = (self.workspace.parent / "cache/debootstrap").resolve()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Construct the bootstrap command.
+        # --variant=minbase: Only essential packages and apt; the rest comes from --include.
         # --arch=amd64: Specifies the architecture.
         # --include: Specifies additional packages to install.
         # debian_release: The target Debian version.
         # self.chroot_path: The target directory for the chroot.
-        # http://deb.debian.org/debian: The Debian mirror URL.
-        cmd: List[str] = [
-            "debootstrap",
-            "--arch=amd64",
-            f"--include={','.join(include_packages)}",
-            debian_release,
-            str(self.chroot_path),
-            "http://deb.debian.org/debian" # Using a standard Debian mirror
-        ]
+        # self.mirror: The Debian mirror URL.
+        cmd: List[str]
+        if shutil.which("mmdebstrap"):
+            # mmdebstrap is preferred: it is faster and pipelines its downloads. The
+            # cache is synced into the chroot's archive directory before the download
+            # and back out afterwards (see mmdebstrap(1), --skip=download/empty and
+            # --skip=essential/unlink).
+            cmd = [
+                "mmdebstrap",
+                "--variant=minbase",
+                "--arch=amd64",
+                f"--include={','.join(INCLUDE_PACKAGES)}",
+                '--aptopt=Acquire::http::Pipeline-Depth "10"',
+                "--skip=download/empty",
+                # Otherwise the essential-set .debs are deleted before sync-out and never cached.
+                "--skip=essential/unlink",
+                '--setup-hook=mkdir -p "$1"/var/cache/apt/archives/',
+                f"--setup-hook=sync-in {shlex.quote(str(cache_dir))} /var/cache/apt/archives/",
+                f"--customize-hook=sync-out /var/cache/apt/archives {shlex.quote(str(cache_dir))}",
+                # The cache copy is enough; keep the .debs out of the chroot itself.
+                '--customize-hook=rm -f "$1"/var/cache/apt/archives/*.deb',
+                debian_release,
+                str(self.chroot_path),
+                self.mirror
+            ]
+        else:
+            cmd = ["debootstrap", "--variant=minbase", "--arch=amd64", f"--include={','.join(INCLUDE_PACKAGES)}"]
+            if _debootstrap_has_cache_dir():
+                cmd.append(f"--cache-dir={cache_dir}")
+            else:
+                # Older debootstrap: every build downloads the packages again.
+                self.logger.warning("debootstrap does not support --cache-dir; packages will not be cached")
+            cmd += [debian_release, str(self.chroot_path), self.mirror]
+
+        # debootstrap (wget) and mmdebstrap (apt) both honour http_proxy.
+        env: Optional[Dict[str, str]] = None
+        if self.apt_proxy:
+            env = {**os.environ, "http_proxy": self.apt_proxy}
         
-        self.logger.info(f"Executing debootstrap command: {' '.join(cmd)}")
+        self.logger.info(f"Executing bootstrap command: {' '.join(cmd)}")
         # Execute the command, raising an exception on failure.
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        subprocess.run(cmd, check=True, capture_output=True, text=True, env=env)
         self.logger.info("Debootstrap command completed successfully.")
     
     def _configure_system(self, debian_release: str) -> None:
@@ -171,158 +581,206 @@ class Debootstrap:
         updating packages, installing essential utilities, and configuring
         locale and timezone.
 
+        `apt-get update` is started as soon as sources.list is written; the
+        remaining files and the timezone symlink don't touch APT, so they are
+        written from the host side while the package lists download, and the
+        locale is generated at the same time.
+
         Args:
             debian_release: The Debian release name.
         """
         
         self.logger.info("Configuring basic system settings in chroot...")
         
-        # Configure /etc/apt/sources.list to include main, updates, security, and backports repositories.
-        # non-free-firmware is included for broader hardware compatibility.
-        sources_list_content: str = f"""# Main Debian repositories
-deb http://deb.debian.org/debian {debian_release} main contrib non-free non-free-firmware
-deb http://deb.debian.org/debian {debian_release}-updates main contrib non-free non-free-firmware
-deb http://security.debian.org/debian-security {debian_release}-security main contrib non-free non-free-firmware
-
-# Backports repository (useful for newer software on a stable base)
-deb http://deb.debian.org/debian {debian_release}-backports main contrib non-free non-free-firmware
-"""
-        
-        sources_path: Path = self.chroot_path / "etc/apt/sources.list"
-        with open(sources_path, 'w') as f:
-            f.write(sources_list_content)
+        sources_path: Path = self.chroot_path / "etc/apt/sources.list.d/debian.sources"
+        sources_path.parent.mkdir(parents=True, exist_ok=True)
+        write_file(sources_path, self._sources_content(debian_release))
+        # Drop the one-line sources.list debootstrap wrote, so no suite is listed twice.
+        (self.chroot_path / "etc/apt/sources.list").unlink(missing_ok=True)
         self.logger.debug(f"Configured {sources_path}")
+
+        # Refresh the package lists in the background; only the APT steps below wait on it.
+        self.logger.info("Updating package lists in chroot...")
+        update_proc = self._start_chroot_command(["apt-get", "update"])
+        # locale-gen is CPU-bound and doesn't use APT, so it runs alongside the
+        # network-bound update. `locales` came in with debootstrap's --include.
+        # TODO: Could make locale configurable via build_spec.yml
+        self.logger.info("Generating en_US.UTF-8 locale...")
+        locale_proc = self._start_chroot_command(["locale-gen", "en_US.UTF-8"])
         
         # Configure /etc/hostname.
         hostname_path: Path = self.chroot_path / "etc/hostname"
-        with open(hostname_path, 'w') as f:
-            f.write("zforge\n") # Default hostname for the system being built.
+        write_file(hostname_path, HOSTNAME_CONTENT)
         self.logger.debug(f"Configured {hostname_path}")
         
         # Configure /etc/hosts.
-        hosts_content: str = """127.0.0.1   localhost
-127.0.1.1   zforge
-
-# The following lines are desirable for IPv6 capable hosts
-::1     localhost ip6-localhost ip6-loopback
-ff02::1 ip6-allnodes
-ff02::2 ip6-allrouters
-192.168.0.1 
-9.9.9.9
-"""
         hosts_path: Path = self.chroot_path / "etc/hosts"
-        with open(hosts_path, 'w') as f:
-            f.write(hosts_content)
+        write_file(hosts_path, HOSTS_CONTENT)
         self.logger.debug(f"Configured {hosts_path}")
         
         # Configure a minimal /etc/fstab.
         # The actual fstab will be generated during installation by Calamares or another installer.
-        fstab_content: str = """# /etc/fstab: static file system information.
-# Use 'blkid' to print the universally unique identifier for a
-# device; this may be used with UUID= as a more robust way to name devices
-# that works even if disks are added and removed.
-
-# <file system>  <mount point>  <type>  <options>  <dump>  <pass>
-proc             /proc          proc    defaults   0       0
-"""
         fstab_path: Path = self.chroot_path / "etc/fstab"
-        with open(fstab_path, 'w') as f:
-            f.write(fstab_content)
+        write_file(fstab_path, FSTAB_CONTENT)
         self.logger.debug(f"Configured {fstab_path}")
-        
-        # Update package lists and upgrade installed packages within the chroot.
-        self.logger.info("Updating package lists and upgrading packages in chroot...")
-        self._run_chroot_command(["apt-get", "update"])
-        self._run_chroot_command(["apt-get", "upgrade", "-y"]) # -y to auto-confirm.
-        
-        # Install some essential packages for a functional system and for subsequent build steps.
-        essential_packages: List[str] = [
-            "build-essential",  # For compiling software (e.g., ZFS DKMS modules)
-            "python3",          # Python interpreter
-            "python3-distutils",# For Python package building/installation
-            "vim", "nano",      # Text editors
-            "less", "htop",     # System utilities
-            "net-tools",        # Networking utilities (e.g., ifconfig)
-            "iproute2",         # Modern networking utilities (e.g., ip addr)
-            "iputils-ping"      # For network diagnostics
-        ]
-        self.logger.info(f"Installing essential packages: {', '.join(essential_packages)}")
-        self._run_chroot_command(["apt-get", "install", "-y"] + essential_packages)
-        
-        # Generate the en_US.UTF-8 locale.
-        self.logger.info("Generating en_US.UTF-8 locale...")
-        self._run_chroot_command(["locale-gen", "en_US.UTF-8"])
-        # TODO: Could make locale configurable via build_spec.yml
-        
+
         # Set the default timezone to UTC.
+        # The link target is resolved inside the chroot at lookup time, so it can be
+        # created from the host without entering the chroot.
         self.logger.info("Setting timezone to UTC...")
-        self._run_chroot_command(["ln", "-sf", "/usr/share/zoneinfo/UTC", "/etc/localtime"])
+        localtime_path: Path = self.chroot_path / "etc/localtime"
+        localtime_path.unlink(missing_ok=True)
+        localtime_path.symlink_to("/usr/share/zoneinfo/UTC")
+
+        # The package installs in _install_packages need current package lists.
+        # Both are reaped before either failure is raised.
+        for result in [self._wait_chroot_command(proc, check=False) for proc in (update_proc, locale_proc)]:
+            result.check_returncode()
         self.logger.info("Basic system configuration in chroot completed.")
     
-    def _install_dracut(self) -> None:
+    def _sources_content(self, debian_release: str) -> bytes:
+        """Return the chroot's deb822 APT sources for `debian_release`."""
+
+        # Configure the APT sources (deb822 format) to include main, updates, security, and
+        # backports (useful for newer software on a stable base) repositories.
+        # non-free-firmware is included for broader hardware compatibility.
+        components: str = "main contrib non-free non-free-firmware"
+        keyring: str = "/usr/share/keyrings/debian-archive-keyring.gpg"
+        return f"""Types: deb
+URIs: {self.mirror}
+Suites: {debian_release} {debian_release}-updates {debian_release}-backports
+Components: {components}
+Signed-By: {keyring}
+
+Types: deb
+URIs: http://security.debian.org/debian-security
+Suites: {debian_release}-security
+Components: {components}
+Signed-By: {keyring}
+""".encode()
+
+    def _install_packages(self) -> None:
         """
-        Install and configure dracut within the chroot environment.
+        Install the essential packages and dracut within the chroot environment.
 
-        Dracut is used to generate the initramfs. This method ensures
-        `initramfs-tools` is removed (if present, to avoid conflicts) and
-        then installs `dracut` and its necessary components. A basic
-        dracut configuration tailored for Z-Forge (including ZFS and systemd
-        support) is also created.
+        Dracut is used to generate the initramfs. The Z-Forge dracut
+        configuration (including ZFS and systemd support) is written first,
+        then a single `apt-get install` transaction installs the essential
+        utilities and dracut and removes `initramfs-tools` (to avoid
+        conflicts). One transaction means one dependency solve and one run of
+        the initramfs triggers, which already see the configuration.
+        The optional upgrade (builder_config `upgrade_packages`) runs in the
+        same chroot entry.
         """
         
-        self.logger.info("Installing and configuring dracut in chroot...")
-        
-        # Remove initramfs-tools to prevent conflicts with dracut.
-        # `check=False` as it's not an error if it's not installed.
-        self.logger.debug("Attempting to remove initramfs-tools if present...")
-        self._run_chroot_command(["apt-get", "remove", "-y", "initramfs-tools"], check=False)
+        self.logger.info("Installing packages and configuring dracut in chroot...")
         
-        # Install dracut and related packages.
-        dracut_packages: List[str] = [
-            "dracut",         # Core dracut utility
-            "dracut-core",    # Core dracut modules
-            "dracut-network", # Modules for network support in initramfs (e.g., for network unlock)
-            "dracut-squash"   # Modules for squashfs, if live media uses it directly
-        ]
-        self.logger.info(f"Installing dracut packages: {', '.join(dracut_packages)}")
-        self._run_chroot_command(["apt-get", "install", "-y"] + dracut_packages)
+        # Write the base dracut configuration for Z-Forge (DRACUT_CONF).
         
-        # Create a base dracut configuration file for Z-Forge.
-        # This configuration ensures ZFS, systemd, and NVMe support are included.
-        # It also sets compression to zstd and enables hostonly mode for smaller initramfs.
-        dracut_conf_content: str = """# Z-Forge dracut configuration (etc/dracut.conf.d/zforge.conf)
+        dracut_conf_dir: Path = self.chroot_path / "etc/dracut.conf.d"
+        dracut_conf_dir.mkdir(parents=True, exist_ok=True) # Ensure directory exists.
+        dracut_conf_file: Path = dracut_conf_dir / "zforge.conf"
+        write_file(dracut_conf_file, DRACUT_CONF)
+        self.logger.info(f"Dracut configuration written to {dracut_conf_file}")
 
-# Compression method for the initramfs (zstd offers good compression and speed)
-compress="zstd"
+        self.logger.info(f"Installing essential packages: {', '.join(ESSENTIAL_PACKAGES)}")
+        self.logger.info(f"Installing dracut packages: {', '.join(DRACUT_PACKAGES)}")
+        steps: List[str] = []
+        if self.upgrade_packages:
+            self.logger.info("Upgrading packages in chroot...")
+            steps.append(shlex.join(["apt-get", "upgrade", "-y"] + DPKG_CONF_OPTIONS))
+        steps.append(self._apt_transaction(["initramfs-tools"], ESSENTIAL_PACKAGES + DRACUT_PACKAGES))
+        self._run_chroot_script("\n".join(steps) + "\n")
+        self.logger.info("Package installation and dracut configuration completed.")
+    
+    def _apt_transaction(self, pkgs_to_remove: List[str], pkgs_to_install: List[str]) -> str:
+        """
+        Build a single `apt-get install` command that also removes packages.
 
-# Add dracut modules necessary for ZFS root and systemd.
-add_dracutmodules+=" zfs systemd "
+        A trailing '-' on a package name tells apt-get to remove it (if
+        present) in the same transaction, so dependencies are solved and dpkg
+        triggers run once for both.
 
-# Ensure ZFS filesystem type is recognized by dracut.
-filesystems+=" zfs "
+        Args:
+            pkgs_to_remove: Packages to remove.
+            pkgs_to_install: Packages to install.
 
-# Enable hostonly mode: creates a smaller initramfs tailored to the current hardware.
-# For a generic ISO, this might be set to "no", or specific drivers added.
-# However, 'hostonly="yes"' is often used even for ISOs if the kernel/drivers are generic enough.
-hostonly="yes"
+        Returns:
+            The shell-quoted command, for use in a `bash -c` chain.
+        """
 
-# Kernel command line parameters to be embedded in the initramfs.
-# 'root=zfs:AUTO' tells the system to find the ZFS root pool automatically.
-kernel_cmdline="root=zfs:AUTO"
+        return shlex.join(["apt-get", "install", "-y"] + DPKG_CONF_OPTIONS + pkgs_to_install
+                          + [f"{pkg}-" for pkg in pkgs_to_remove])
 
-# Add any additional drivers needed, e.g., for NVMe drives.
-add_drivers+=" nvme "
-"""
-        
-        dracut_conf_dir: Path = self.chroot_path / "etc/dracut.conf.d"
-        dracut_conf_dir.mkdir(parents=True, exist_ok=True) # Ensure directory exists.
-        dracut_conf_file: Path = dracut_conf_dir / "zforge.conf"
-        with open(dracut_conf_file, 'w') as f:
-            f.write(dracut_conf_content)
-        self.logger.info(f"Dracut configuration written to {dracut_conf_file}")
-        self.logger.info("Dracut installation and basic configuration completed.")
-    
-    def _run_chroot_command(self, command: List[str], check: bool = True) -> subprocess.CompletedProcess:
+    def _start_chroot_command(self, command: List[str], stdin: Optional[int] = None,
+                              capture: bool = False) -> subprocess.Popen:
+        """
+        Start a command within the chroot environment without waiting for it.
+
+        When the output is wanted (`capture`, or debug logging is on), stderr
+        is merged into stdout so it can be streamed line by line. Otherwise
+        stdout goes to /dev/null, so apt's progress output is never read, and
+        only stderr is kept for error reports. Pair with `_wait_chroot_command`
+        to collect the result.
+
+        Args:
+            command: A list of strings representing the command and its arguments.
+            stdin: Passed through to `subprocess.Popen`.
+            capture: If True, the command's output is always read.
+
+        Returns:
+            The running `subprocess.Popen` instance.
+        """
+
+        # Prepend "chroot" and the chroot path to the command.
+        full_cmd: List[str] = ["chroot", str(self.chroot_path)] + command
+        self.logger.info(f"Executing in chroot: {' '.join(command)}")
+        # DEBIAN_FRONTEND=noninteractive keeps package scripts from prompting.
+        if capture or self.logger.isEnabledFor(logging.DEBUG):
+            return subprocess.Popen(full_cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, bufsize=1, env=self._chroot_env)
+        return subprocess.Popen(full_cmd, stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, bufsize=1, env=self._chroot_env)
+
+    def _wait_chroot_command(self, proc: subprocess.Popen, check: bool = True,
+                             capture: bool = False) -> subprocess.CompletedProcess:
+        """
+        Stream the output of a command started with `_start_chroot_command` and wait for it.
+
+        Each output line goes to the debug log as it arrives, so apt's progress
+        shows up in the build log and a chatty install never fills the pipe.
+
+        Args:
+            proc: The `subprocess.Popen` instance to wait for.
+            check: If True, a `subprocess.CalledProcessError` will be raised
+                   if the command returns a non-zero exit code. Defaults to True.
+            capture: If True, all of the output is returned rather than its tail.
+
+        Returns:
+            A `subprocess.CompletedProcess` instance whose stdout holds the
+            output read (stdout and stderr, or stderr alone), limited to the
+            last CHROOT_OUTPUT_TAIL lines unless `capture` is set.
+
+        Raises:
+            subprocess.CalledProcessError: If `check` is True and the command fails.
+        """
+
+        # Only the tail is kept for error reports; the full output is in the log.
+        tail: Deque[str] = deque(maxlen=None if capture else CHROOT_OUTPUT_TAIL)
+        # With stdout discarded, stderr is the only pipe left to read.
+        stream = proc.stdout if proc.stdout is not None else proc.stderr
+        with proc:
+            for line in stream:
+                line = line.rstrip()
+                self.logger.debug(f"chroot: {line}")
+                tail.append(line)
+        output: str = "\n".join(tail)
+        if check and proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args, output)
+        return subprocess.CompletedProcess(proc.args, proc.returncode, output)
+
+    def _run_chroot_command(self, command: List[str], check: bool = True,
+                            capture: bool = False) -> subprocess.CompletedProcess:
         """
         Helper method to run a command within the chroot environment.
 
@@ -330,24 +788,43 @@ add_drivers+=" nvme "
             command: A list of strings representing the command and its arguments.
             check: If True, a `subprocess.CalledProcessError` will be raised
                    if the command returns a non-zero exit code. Defaults to True.
+            capture: If True, the full output is read and returned, for callers
+                     that need it; otherwise it is only logged (at debug level).
 
         Returns:
-            A `subprocess.CompletedProcess` instance.
+            A `subprocess.CompletedProcess` instance (see `_wait_chroot_command`).
 
         Raises:
             subprocess.CalledProcessError: If `check` is True and the command fails.
         """
-        
-        # Prepend "chroot" and the chroot path to the command.
-        full_cmd: List[str] = ["chroot", str(self.chroot_path)] + command
-        self.logger.info(f"Executing in chroot: {' '.join(command)}")
-        
-        # Run the command.
-        # `text=True` decodes stdout/stderr as strings.
-        # `capture_output=True` is useful if we need to inspect output/errors from this helper.
-        result = subprocess.run(full_cmd, check=check, capture_output=True, text=True)
-        if result.stdout:
-            self.logger.debug(f"Chroot command stdout: {result.stdout.strip()}")
-        if result.stderr:
-            self.logger.debug(f"Chroot command stderr: {result.stderr.strip()}") # Use debug for stderr as it might be noisy
-        return result
+
+        return self._wait_chroot_command(self._start_chroot_command(command, capture=capture),
+                                         check=check, capture=capture)
+
+    def _run_chroot_script(self, script: str, check: bool = True) -> subprocess.CompletedProcess:
+        """
+        Run a shell script within the chroot environment in a single chroot entry.
+
+        The script is passed to `bash -ec` as an argument, so it stops at the
+        first failing line; append `|| true` to lines that may fail. stdin is
+        /dev/null: a script fed on stdin could be read (and cut short) by
+        apt-get, dpkg maintainer scripts or debconf. Output is streamed to the
+        log as with `_run_chroot_command`.
+
+        Args:
+            script: The script, one command per line.
+            check: If True, a `subprocess.CalledProcessError` will be raised
+                   if the script returns a non-zero exit code. Defaults to True.
+
+        Returns:
+            A `subprocess.CompletedProcess` instance (see `_wait_chroot_command`).
+
+        Raises:
+            subprocess.CalledProcessError: If `check` is True and the script fails.
+        """
+
+        for line in script.splitlines():
+            self.logger.debug(f"chroot script: {line}")
+        proc: subprocess.Popen = self._start_chroot_command(["/bin/bash", "-ec", script],
+                                                            stdin=subprocess.DEVNULL)
+        return self._wait_chroot_command(proc, check=check)
@@ -6,12 +6,52 @@ Dracut Configuration Module
 Ensures dracut is properly installed and configured for ZFS
 """
 
+import hashlib
+import os
+import re
 import subprocess
 import shutil
 from pathlib import Path
 from typing import Dict, Optional
 import logging
 
+from builder.utils.file_io import write_file
+
+# Main dracut configuration
+DRACUT_CONF = b"""# Z-Forge dracut configuration
+
+# Compression method (multithreaded zstd at a fast level; slightly larger output)
+compress="zstd -q -T0 -3"
+
+# Include extra modules for ZFS support
+add_dracutmodules+=" zfs "
+
+# Include necessary filesystem modules
+filesystems+=" zfs "
+
+# Include systemd support
+add_dracutmodules+=" systemd "
+
+# Enable hostonly mode for better performance
+hostonly="yes"
+
+# Add kernel command line parameters
+kernel_cmdline="root=zfs:AUTO"
+
+# Include any additional drivers needed for NVMe
+add_drivers+=" nvme "
+"""
+
+# ZFS-specific configuration
+ZFS_DRACUT_CONF = b"""# ZFS dracut configuration
+
+# Enable ZFS hostid support
+install_optional_items+=" /etc/hostid /etc/zfs/zpool.cache "
+
+# Include ZFS commands
+install_items+=" /usr/bin/zfs /usr/bin/zpool "
+"""
+
 class DracutConfig:
     """Handles dracut installation and configuration"""
     
@@ -32,11 +72,24 @@ class DracutConfig:
         self.logger.info("Starting dracut configuration...")
         
         try:
-            # Remove initramfs-tools
-            self._remove_initramfs_tools()
-            
-            # Install dracut packages
-            self._install_dracut()
+            # Skip dpkg's per-file fsync while packages are removed and installed;
+            # the setting is dropped again so the built system keeps safe defaults.
+            speedup_path = self.chroot_path / "etc/dpkg/dpkg.cfg.d/02apt-speedup"
+            speedup_path.parent.mkdir(parents=True, exist_ok=True)
+            write_file(speedup_path, b"force-unsafe-io\n")
+            try:
+                # Debootstrap normally installs dracut (and removes initramfs-tools)
+                # in its own package transaction already.
+                if (self.chroot_path / "usr/bin/dracut").exists():
+                    self.logger.info("dracut already installed, skipping package changes")
+                else:
+                    # Remove initramfs-tools
+                    self._remove_initramfs_tools()
+                    
+                    # Install dracut packages
+                    self._install_dracut()
+            finally:
+                speedup_path.unlink(missing_ok=True)
             
             # Configure dracut
             self._configure_dracut()
@@ -86,49 +139,13 @@ class DracutConfig:
         
         self.logger.info("Configuring dracut...")
         
-        # Create main dracut configuration
-        dracut_conf = """# Z-Forge dracut configuration
-
-# Compression method
-compress="zstd"
-
-# Include extra modules for ZFS support
-add_dracutmodules+=" zfs "
-
-# Include necessary filesystem modules
-filesystems+=" zfs "
-
-# Include systemd support
-add_dracutmodules+=" systemd "
-
-# Enable hostonly mode for better performance
-hostonly="yes"
-
-# Add kernel command line parameters
-kernel_cmdline="root=zfs:AUTO"
-
-# Include any additional drivers needed for NVMe
-add_drivers+=" nvme "
-"""
-        
+        # Write main and ZFS-specific dracut configuration
         dracut_conf_path = self.chroot_path / "etc/dracut.conf.d/zforge.conf"
         dracut_conf_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(dracut_conf_path, 'w') as f:
-            f.write(dracut_conf)
-        
-        # Create ZFS-specific configuration
-        zfs_conf = """# ZFS dracut configuration
-
-# Enable ZFS hostid support
-install_optional_items+=" /etc/hostid /etc/zfs/zpool.cache "
-
-# Include ZFS commands
-install_items+=" /usr/bin/zfs /usr/bin/zpool "
-"""
+        write_file(dracut_conf_path, DRACUT_CONF)
         
         zfs_conf_path = self.chroot_path / "etc/dracut.conf.d/zfs.conf"
-        with open(zfs_conf_path, 'w') as f:
-            f.write(zfs_conf)
+        write_file(zfs_conf_path, ZFS_DRACUT_CONF)
         
         # Create hostid if it doesn't exist
         hostid_path = self.chroot_path / "etc/hostid"
@@ -170,12 +187,9 @@ install_items+=" /usr/bin/zfs /usr/bin/zpool "
         self.logger.info(f"Copying {hook_script_src} to {hook_script_dst}")
         shutil.copy2(hook_script_src, hook_script_dst)
 
-        # Set execute permissions
-        chmod_path_setup = "/" + str(module_setup_dst.relative_to(self.chroot_path))
-        chmod_path_hook = "/" + str(hook_script_dst.relative_to(self.chroot_path))
-
-        subprocess.run(["chroot", str(self.chroot_path), "chmod", "+x", chmod_path_setup], check=True)
-        subprocess.run(["chroot", str(self.chroot_path), "chmod", "+x", chmod_path_hook], check=True)
+        # Set execute permissions (from the host; no need to enter the chroot)
+        for script_path in (module_setup_dst, hook_script_dst):
+            script_path.chmod(script_path.stat().st_mode | 0o111)
         self.logger.info(f"Set execute permissions for custom Dracut module scripts in chroot.")
 
         dracut_zforge_conf_path = self.chroot_path / "etc/dracut.conf.d/zforge.conf"
@@ -197,34 +211,72 @@ install_items+=" /usr/bin/zfs /usr/bin/zpool "
         
         self.logger.info("Generating initramfs with dracut...")
         
-        # Find installed kernel
-        kernel_version_cmd = "ls -1 /lib/modules | tail -1"
-        result = subprocess.run(
-            ["chroot", str(self.chroot_path), "bash", "-c", kernel_version_cmd],
-            capture_output=True,
-            text=True,
-            check=True
+        # Find the newest installed kernel. Numeric runs compare as numbers, so
+        # 6.10.0 sorts after 6.9.0 (kernel versions aren't valid PEP 440 versions).
+        modules_dir = self.chroot_path / "lib/modules"
+        kernel_versions = sorted(
+            (p.name for p in modules_dir.iterdir() if p.is_dir()) if modules_dir.is_dir() else [],
+            key=lambda name: [(0, int(part), "") if part.isdigit() else (1, 0, part)
+                              for part in re.split(r"(\d+)", name)]
         )
         
-        kernel_version = result.stdout.strip()
-        
-        if not kernel_version:
+        if not kernel_versions:
             raise Exception("No kernel modules found")
+        kernel_version = kernel_versions[-1]
+        
+        # Skip the (slow) regeneration if nothing dracut reads has changed since
+        # the last run; ZFORGE_FORCE_DRACUT=1 always regenerates.
+        # Kept in the workspace, outside the chroot, so it never ships in the image
+        stamp_path = self.workspace / "dracut.stamp"
+        initramfs_path = self.chroot_path / f"boot/initramfs-{kernel_version}.img"
+        inputs_hash = self._initramfs_inputs_hash(kernel_version)
+        if (os.environ.get("ZFORGE_FORCE_DRACUT") != "1" and initramfs_path.exists()
+                and stamp_path.exists() and stamp_path.read_text().strip() == inputs_hash):
+            self.logger.info(f"Initramfs for kernel {kernel_version} is up to date, skipping initramfs regeneration")
+            return
         
         self.logger.info(f"Regenerating initramfs for kernel {kernel_version}")
         
-        # Generate initramfs
-        subprocess.run([
-            "chroot", str(self.chroot_path),
-            "dracut", "-f", f"/boot/initramfs-{kernel_version}.img", kernel_version,
-            "--force", "--verbose"
-        ], check=True)
+        # Generate initramfs, then create a symbolic link for compatibility
+        self._run_chroot_script(
+            f"dracut -f /boot/initramfs-{kernel_version}.img {kernel_version} --force --verbose\n"
+            f"ln -sf initramfs-{kernel_version}.img /boot/initrd.img-{kernel_version}\n"
+        )
         
-        # Create symbolic link for compatibility
-        subprocess.run([
-            "chroot", str(self.chroot_path),
-            "ln", "-sf", f"initramfs-{kernel_version}.img", f"/boot/initrd.img-{kernel_version}"
-        ], check=True)
+        stamp_path.parent.mkdir(parents=True, exist_ok=True)
+        write_file(stamp_path, f"{inputs_hash}\n".encode())
+    
+    def _initramfs_inputs_hash(self, kernel_version: str) -> str:
+        """Hash the dracut version and configuration, ZFS and custom modules, hostid and kernel the initramfs is built from"""
+        
+        digest = hashlib.sha256(kernel_version.encode())
+        digest.update(self._get_dracut_version().encode())
+        modules_d = self.chroot_path / "usr/lib/dracut/modules.d"
+        inputs = sorted((self.chroot_path / "etc/dracut.conf.d").glob("*.conf"))
+        inputs += sorted((modules_d / "90zforge-toram").glob("*"))
+        # The zfs dracut module is replaced whenever ZFSBuild rebuilds ZFS
+        inputs += sorted((modules_d / "90zfs").rglob("*"))
+        inputs.append(self.chroot_path / "etc/hostid")
+        for path in inputs:
+            digest.update(str(path.relative_to(self.chroot_path)).encode())
+            if path.is_file():
+                digest.update(path.read_bytes())
+        # depmod rewrites modules.dep whenever modules (e.g. DKMS-built ZFS) change.
+        modules_dep = self.chroot_path / "lib/modules" / kernel_version / "modules.dep"
+        if modules_dep.exists():
+            dep_stat = modules_dep.stat()
+            digest.update(f"{dep_stat.st_size}:{dep_stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+    
+    def _run_chroot_script(self, script: str):
+        """Run a shell script in the chroot with one chroot entry, stopping at the first failing line"""
+        
+        # Passed as an argument, not on stdin, so no command in it can consume the rest
+        subprocess.run(
+            ["chroot", str(self.chroot_path), "/bin/bash", "-ec", script],
+            stdin=subprocess.DEVNULL,
+            check=True
+        )
     
     def _get_dracut_version(self):
         """Get installed dracut version"""
@@ -6,12 +6,26 @@ ZFS Pool Detection Module
 Scans system for existing ZFS pools and validates them for installation
 """
 
+import concurrent.futures
 import subprocess
 import json
 import os
+import re
 import libcalamares
 from typing import Dict, List, Optional
 
+# py-libzfs reads pool state over ioctls; without it we parse the zpool/zfs CLIs
+try:
+    import libzfs
+except ImportError:
+    libzfs = None
+
+# lsblk -P prints one device per line as KEY="value" pairs
+LSBLK_PAIR_RE = re.compile(r'(\w+)="([^"]*)"')
+
+# lsblk does not depend on pool state, so it runs here while the pools are scanned
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
 def pretty_name():
     return "Detecting ZFS Storage Pools"
 
@@ -26,6 +40,7 @@ def run():
     """
     
     libcalamares.utils.debug("Starting ZFS pool detection...")
+    disks_future = _EXECUTOR.submit(list_available_disks)
     
     try:
         # Import all pools in read-only mode for safety
@@ -53,6 +68,7 @@ def run():
         # Store results in global storage for next module
         libcalamares.globalstorage.insert("zfs_pools", pool_info)
         libcalamares.globalstorage.insert("zfs_pool_names", list(pool_info.keys()))
+        publish_available_disks(disks_future.result())
         
         # Log detected configuration
         libcalamares.utils.debug(f"Detected pools: {json.dumps(pool_info, indent=2)}")
@@ -117,11 +133,21 @@ def scan_pool(pool_name: str) -> Dict:
     info = {
         'suitable_for_install': False,
         'existing_roots': [],
+        'has_proxmox': False,  # any(r['is_proxmox'] for r in existing_roots), kept in sync below
         'pool_status': 'unknown',
         'pool_health': 'unknown',
         'features': {},
         'properties': {}
     }
+
+    if libzfs is not None:
+        try:
+            return scan_pool_libzfs(pool_name, info)
+        except libzfs.ZFSException as e:
+            libcalamares.utils.warning(f"libzfs scan of {pool_name} failed, using zpool/zfs: {e}")
+            # Start over from a clean slate; the libzfs pass may have got partway
+            info.update(suitable_for_install=False, existing_roots=[], has_proxmox=False,
+                        pool_status='unknown', pool_health='unknown', features={}, properties={})
     
     # Get pool status
     status_result = subprocess.run(
@@ -157,9 +183,11 @@ def scan_pool(pool_name: str) -> Dict:
     if 'feature@encryption' in info['properties']:
         info['features']['encryption'] = info['properties']['feature@encryption'] == 'active'
     
-    # List datasets
+    # List datasets. Root candidates live at most two levels down (pool/ROOT/<name>),
+    # so cap the walk there instead of recursing through every child dataset and
+    # only project the two columns parsed below.
     datasets_result = subprocess.run(
-        ["zfs", "list", "-r", "-H", "-o", "name,mountpoint", pool_name],
+        ["zfs", "list", "-t", "filesystem", "-d", "2", "-H", "-p", "-o", "name,mountpoint", pool_name],
         capture_output=True,
         text=True
     )
@@ -169,25 +197,56 @@ def scan_pool(pool_name: str) -> Dict:
             parts = line.split('\t')
             if len(parts) == 2:
                 dataset, mountpoint = parts
-                
-                # Check if this looks like a root dataset
-                # Look for ROOT/proxmox or ROOT/pve patterns
-                if '/ROOT/' in dataset or mountpoint == '/':
-                    # Try to detect if it's a Proxmox installation
-                    if is_proxmox_root(dataset):
-                        info['existing_roots'].append({
-                            'dataset': dataset,
-                            'mountpoint': mountpoint,
-                            'is_proxmox': True
-                        })
-                        info['suitable_for_install'] = True
-                    else:
-                        info['existing_roots'].append({
-                            'dataset': dataset,
-                            'mountpoint': mountpoint,
-                            'is_proxmox': False
-                        })
+                add_root_candidate(info, dataset, mountpoint)
     
+    return finish_scan(info)
+
+def scan_pool_libzfs(pool_name: str, info: Dict) -> Dict:
+    """Fill the scan_pool dict from py-libzfs instead of zpool/zfs output"""
+    pool = libzfs.ZFS().get(pool_name)
+
+    if pool.status == 'ONLINE':
+        info['pool_status'] = 'online'
+    info['pool_health'] = pool.status
+    info['properties'] = {name: prop.value for name, prop in pool.properties.items()}
+    for feature in pool.features:
+        state = getattr(feature.state, 'name', str(feature.state)).lower()
+        info['properties'][f"feature@{feature.name.lower()}"] = state
+
+    if 'feature@encryption' in info['properties']:
+        info['features']['encryption'] = info['properties']['feature@encryption'] == 'active'
+
+    # Same depth as the CLI path: the pool's children and grandchildren (pool/ROOT/<name>)
+    for child in pool.root_dataset.children:
+        for dataset in [child, *child.children]:
+            if dataset.type == libzfs.DatasetType.FILESYSTEM:
+                add_root_candidate(info, dataset.name, dataset.properties['mountpoint'].value)
+
+    return finish_scan(info)
+
+def add_root_candidate(info: Dict, dataset: str, mountpoint: str):
+    """Record a dataset in existing_roots if it looks like a root filesystem"""
+    # Check if this looks like a root dataset
+    # Look for ROOT/proxmox or ROOT/pve patterns
+    if '/ROOT/' in dataset or mountpoint == '/':
+        # Try to detect if it's a Proxmox installation
+        if is_proxmox_root(dataset):
+            info['existing_roots'].append({
+                'dataset': dataset,
+                'mountpoint': mountpoint,
+                'is_proxmox': True
+            })
+            info['has_proxmox'] = True
+            info['suitable_for_install'] = True
+        else:
+            info['existing_roots'].append({
+                'dataset': dataset,
+                'mountpoint': mountpoint,
+                'is_proxmox': False
+            })
+
+def finish_scan(info: Dict) -> Dict:
+    """Final suitability check shared by both scan paths"""
     # If no Proxmox found, but pool is healthy, still suitable
     if info['pool_health'] == 'ONLINE' and not info['existing_roots']:
         info['suitable_for_install'] = True
@@ -235,6 +294,54 @@ def is_proxmox_root(dataset: str) -> bool:
         except:
             pass
 
+def block_devices_key() -> Optional[List[str]]:
+    """Whole-disk names under /sys/block, published so consumers can spot hotplug"""
+    try:
+        return sorted(os.listdir("/sys/block"))
+    except OSError:
+        return None
+
+def list_available_disks() -> Optional[List[Dict]]:
+    """Scan whole disks with lsblk; returns None if lsblk failed
+
+    Rows are parsed as lsblk prints them and only TYPE=disk rows are kept, so the
+    full output is never held as one string.
+    """
+    cmd = ["lsblk", "-dPno", "NAME,PATH,MODEL,SIZE,TYPE,TRAN", "--bytes", "--exclude", "7,1"]
+    disks = []
+    try:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as proc:
+            for line in proc.stdout:
+                row = dict(LSBLK_PAIR_RE.findall(line))
+                if row.get("TYPE") == "disk":
+                    disks.append(row)
+            stderr = proc.stderr.read()
+    except OSError as e:
+        # Not fatal: the selector falls back to scanning on its own
+        libcalamares.utils.warning(f"Could not list disks for the target selector: {e}")
+        return None
+
+    if proc.returncode != 0:
+        libcalamares.utils.warning(f"Could not list disks for the target selector: {stderr.strip()}")
+        return None
+    return disks
+
+def publish_available_disks(disks: Optional[List[Dict]]):
+    """Share the disk scan via global storage.
+
+    The target selector reads "available_disks" instead of running lsblk on its
+    UI thread. "available_disks_generation" is bumped on every publish so a
+    consumer can tell that its copy is stale after a rescan, and
+    "available_disks_key" records which disks existed when it was taken.
+    """
+    if disks is None:
+        return
+
+    generation = (libcalamares.globalstorage.value("available_disks_generation") or 0) + 1
+    libcalamares.globalstorage.insert("available_disks", disks)
+    libcalamares.globalstorage.insert("available_disks_key", block_devices_key())
+    libcalamares.globalstorage.insert("available_disks_generation", generation)
+
 def export_pool(pool_name: str):
     """Export a pool to release it"""
     subprocess.run(
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# z-forge/builder/utils/file_io.py
+"""
+Small file helpers shared by the builder modules
+"""
+import os
+from pathlib import Path
+
+
+def write_file(path: Path, data: bytes) -> None:
+    """
+    Write `data` to `path` (created 0644, or truncated) with a single write.
+
+    The chroot configuration files are small and written whole, so Python's
+    buffered text layer is skipped.
+    """
+
+    fd: int = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
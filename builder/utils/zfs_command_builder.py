@@ -9,6 +9,8 @@ def build_zpool_create_command(
     root_fs_options: Optional[Dict[str, str]] = None,
     mountpoint: str = "none",
     altroot: Optional[str] = None,
+    log_devices: Optional[List[str]] = None,
+    cache_devices: Optional[List[str]] = None,
 ) -> List[str]:
     """
     Builds a zpool create command list.
@@ -22,6 +24,8 @@ def build_zpool_create_command(
         root_fs_options: Optional dictionary of ZFS filesystem properties for the root dataset (-O property=value).
         mountpoint: Mountpoint for the root dataset. Defaults to "none".
         altroot: Optional alternative root directory (-R /altroot).
+        log_devices: Optional list of SLOG device paths (added as a "log" vdev).
+        cache_devices: Optional list of L2ARC device paths (added as a "cache" vdev).
 
     Returns:
         A list of strings representing the zpool create command.
@@ -76,6 +80,14 @@ def build_zpool_create_command(
         cmd.append(raid_type)
         cmd.extend(disks)
 
+    # Auxiliary vdevs
+    if log_devices:
+        cmd.append("log")
+        cmd.extend(log_devices)
+    if cache_devices:
+        cmd.append("cache")
+        cmd.extend(cache_devices)
+
     return cmd
 
 # Example Usage (comments):
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# z-forge/tests/test_zfstargetselector.py - ZFS target selector finalize tests
+
+"""
+Tests for the GTK-free part of the ZFS target selector: _finalize_selection
+and the zpool create helpers it uses. libcalamares only exists inside
+Calamares, so a minimal stand-in is installed before the module is imported.
+"""
+
+import subprocess
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+if "libcalamares" not in sys.modules:
+    _utils = types.ModuleType("libcalamares.utils")
+    _utils.debug = _utils.warning = _utils.error = lambda message: None
+    _utils.gettext_path = lambda: None
+    _utils.gettext_languages = lambda: []
+    _libcalamares = types.ModuleType("libcalamares")
+    _libcalamares.utils = _utils
+    sys.modules["libcalamares"] = _libcalamares
+    sys.modules["libcalamares.utils"] = _utils
+
+from builder.modules import calamares_zfstargetselector as selector
+
+ADVANCED = {
+    "ashift": "12", "compression": "zstd", "zstd_level": 3, "recordsize": "Default (128K)",
+    "atime": "relatime", "xattr": "sa", "dnodesize": "auto", "arc_max_gb": 4, "l2arc_devices": "",
+}
+
+
+def make_form(**overrides):
+    """A _snapshot_form() dict for a two-disk mirror; overrides replace top-level keys"""
+    form = {
+        "creating_new_pool": True,
+        "new_pool_name": "rpool",
+        "raid_type": "mirror",
+        "disks": ["/dev/sda", "/dev/sdb"],
+        "existing_pool_name": None,
+        "install_mode": "new",
+        "dataset": "ROOT/pve",
+        "encryption_enabled": False,
+        "encryption_password": "",
+        "encryption_algorithm": "",
+        "advanced": dict(ADVANCED),
+        "altroot": "/mnt",
+    }
+    form.update(overrides)
+    return form
+
+
+@pytest.fixture(autouse=True)
+def passing_dry_run(monkeypatch):
+    """No zpool or real disks here; the dry run succeeds unless a test stubs it again"""
+    monkeypatch.setattr(selector.subprocess, "run",
+                        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 0, "", ""))
+
+
+@pytest.mark.parametrize("dataset, chain", [
+    ("ROOT/pve", ["rpool/ROOT", "rpool/ROOT/pve"]),
+    ("pve", ["rpool/pve"]),
+    ("ROOT/debian/sys", ["rpool/ROOT", "rpool/ROOT/debian", "rpool/ROOT/debian/sys"]),
+])
+def test_new_pool_dataset_chain(dataset, chain):
+    selected, updates, error = selector._finalize_selection(make_form(dataset=dataset))
+
+    assert error is None
+    assert updates["zfs_dataset_chain"] == chain
+    assert updates["zfs_dataset_chain"][-1] == selected["dataset"]
+    assert updates["zfs_install_dataset_relative"] == dataset
+    assert selected["pool"] == "rpool"
+    assert selected["mode"] == "new_pool"
+
+
+@pytest.mark.parametrize("dataset", ["ROOT/", "ROOT//pve", "/pve"])
+def test_new_pool_rejects_empty_dataset_component(dataset):
+    selected, updates, error = selector._finalize_selection(make_form(dataset=dataset))
+
+    assert selected is None and updates is None
+    assert "Root dataset name is empty" in error
+
+
+@pytest.mark.parametrize("altroot", ["/mnt", "/tmp/calamares-root"])
+def test_new_pool_mountpoint_flags(altroot):
+    _selected, updates, _error = selector._finalize_selection(make_form(altroot=altroot))
+    command = updates["zfs_new_pool_command"]
+
+    assert command[:2] == ["zpool", "create"]
+    assert command[command.index("-R") + 1] == altroot
+    assert command[command.index("-m") + 1] == "/"
+
+
+@pytest.mark.parametrize("advanced, expected, absent", [
+    ({}, ["-o", "ashift=12", "-O", "compression=zstd-3", "-O", "recordsize=128K"], []),
+    ({"ashift": "Auto-detect", "compression": "lz4", "recordsize": "1M"},
+     ["-O", "compression=lz4", "-O", "recordsize=1M"], ["ashift=12"]),
+    ({"l2arc_devices": "/dev/nvme0n1 '/dev/disk/by-id/my ssd' /dev/nvme0n1"},
+     ["cache", "/dev/nvme0n1", "/dev/disk/by-id/my ssd"], []),
+])
+def test_new_pool_command_options(advanced, expected, absent):
+    form = make_form(advanced=dict(ADVANCED, **advanced))
+    _selected, updates, _error = selector._finalize_selection(form)
+    command = updates["zfs_new_pool_command"]
+
+    assert any(command[i:i + len(expected)] == expected for i in range(len(command)))
+    assert command.count("/dev/nvme0n1") <= 1  # Duplicate L2ARC entries are dropped
+    for arg in absent:
+        assert arg not in command
+
+
+def test_new_pool_rejects_unbalanced_l2arc_quote():
+    form = make_form(advanced=dict(ADVANCED, l2arc_devices="'/dev/nvme0n1"))
+    selected, updates, error = selector._finalize_selection(form)
+
+    assert selected is None and updates is None
+    assert "unbalanced quote" in error
+
+
+def test_new_pool_reports_dry_run_failure(monkeypatch):
+    monkeypatch.setattr(selector.subprocess, "run", lambda cmd, **kwargs: subprocess.CompletedProcess(
+        cmd, 1, "", "cannot create 'rpool': /dev/sda is part of <active> pool 'tank'\n"))
+
+    assert selector._finalize_selection(make_form()) == (None, None, (
+        "<span foreground='red'>zpool rejected this configuration: "
+        "cannot create &#x27;rpool&#x27;: /dev/sda is part of &lt;active&gt; pool &#x27;tank&#x27;</span>"))
+
+
+def test_new_pool_reports_command_build_error():
+    selected, updates, error = selector._finalize_selection(make_form(raid_type="raid<10>"))
+
+    assert selected is None and updates is None
+    assert error == "<span foreground='red'>Error: Invalid raid_type: raid&lt;10&gt;</span>"
+
+
+@pytest.mark.parametrize("encryption_enabled, keyformat", [(False, None), (True, "passphrase")])
+def test_new_pool_encryption(encryption_enabled, keyformat):
+    form = make_form(encryption_enabled=encryption_enabled,
+                     encryption_password="hunter22" if encryption_enabled else "")
+    selected, updates, _error = selector._finalize_selection(form)
+
+    assert updates.get("zfs_encryption_keyformat") == keyformat
+    assert ("encryption=on" in updates["zfs_new_pool_command"]) == encryption_enabled
+    assert "encryption_password" not in selected  # Kept out of the summary dict
+
+
+@pytest.mark.parametrize("install_mode, dataset, expected", [
+    ("new", "ROOT/proxmox", "tank/ROOT/proxmox"),
+    ("replace", "pve", "tank/pve"),
+    ("alongside", "ROOT/debian", "tank/ROOT/debian"),
+])
+def test_existing_pool_selection(install_mode, dataset, expected):
+    form = make_form(creating_new_pool=False, existing_pool_name="tank",
+                     install_mode=install_mode, dataset=dataset)
+    selected, updates, error = selector._finalize_selection(form)
+
+    assert error is None
+    assert selected["dataset"] == expected
+    assert selected["mode"] == install_mode
+    assert updates["zfs_operation_mode"] == "existing_pool"
+    assert updates["install_dataset"] == selected["dataset"]
+    assert "zfs_new_pool_command" not in updates
+
+
+def test_existing_pool_without_selection_closes_quietly():
+    form = make_form(creating_new_pool=False, existing_pool_name=None)
+
+    assert selector._finalize_selection(form) == (None, None, None)
+
+
+def test_zpool_create_command_is_memoized():
+    args = (("pool_name", "rpool"), ("raid_type", "stripe"), ("disks", ("/dev/sda",)),
+            ("ashift", None), ("properties", ()), ("root_fs_options", (("atime", "off"),)),
+            ("mountpoint", "/"), ("altroot", "/mnt"), ("log_devices", ()), ("cache_devices", ()))
+    command = selector._zpool_create_command(args)
+
+    assert isinstance(command, tuple)
+    assert selector._zpool_create_command(args) is command
+    assert command[command.index("-m") + 1] == "/"
+
+
+@pytest.mark.parametrize("returncode, stderr, expected", [
+    (0, "", None),
+    (1, "cannot create 'rpool': /dev/sda is busy\n", "cannot create 'rpool': /dev/sda is busy"),
+    (2, "", "zpool exited with status 2"),
+])
+def test_zpool_dry_run(monkeypatch, returncode, stderr, expected):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, returncode, "", stderr)
+
+    monkeypatch.setattr(selector.subprocess, "run", fake_run)
+    command = ["zpool", "create", "-f", "-m", "/", "rpool", "/dev/sda"]
+
+    assert selector._zpool_dry_run(command) == expected
+    assert calls == [["zpool", "create", "-n", "-f", "-m", "/", "rpool", "/dev/sda"]]
+
+
+def test_zpool_dry_run_without_zpool(monkeypatch):
+    def missing_zpool(cmd, **kwargs):
+        raise FileNotFoundError(cmd[0])
+
+    monkeypatch.setattr(selector.subprocess, "run", missing_zpool)
+
+    assert selector._zpool_dry_run(["zpool", "create", "rpool", "/dev/sda"]) is None